@@ -0,0 +1,244 @@
+"""
+Summary tables that are maintained on write so the stats pages never have
+to fold the whole of game_players on a page view.
+
+player_stats holds one row per (username, period), where period is either
+ALL_TIME or a month key ("YYYY-MM"). balance_series holds one row per
+(username, date) with that day's net and the running total, ready for the
+balance charts. players.games_played and players.total_rebuys are the
+leaderboard counters, kept on the player row so every sort order is a
+plain index scan. Writers call these helpers inside their own transaction;
+`rebuild` regenerates everything from game_players after manual edits to
+the database:
+
+    python aggregates.py rebuild
+"""
+import sys
+
+ALL_TIME = "all"
+
+_UPSERT_STATS = """
+INSERT INTO player_stats
+    (username, period, net, invested, rebuys, games_played, wins, best_session, worst_session)
+VALUES (?, ?, ?, ?, ?, 1, ?, ?, ?)
+ON CONFLICT(username, period) DO UPDATE SET
+    net           = net + excluded.net,
+    invested      = invested + excluded.invested,
+    rebuys        = rebuys + excluded.rebuys,
+    games_played  = games_played + 1,
+    wins          = wins + excluded.wins,
+    best_session  = MAX(best_session, excluded.best_session),
+    worst_session = MIN(worst_session, excluded.worst_session)
+"""
+
+# Shared SELECT list; `period_expr` is either a bound parameter or the month key
+_STATS_SELECT = """
+SELECT gp.username,
+       {period_expr},
+       SUM(gp.net),
+       SUM(gp.buyin + gp.rebuys * gp.buyin),
+       SUM(gp.rebuys),
+       COUNT(DISTINCT gp.game_id),
+       SUM(CASE WHEN g.winner = gp.username AND g.amount > 0 THEN 1 ELSE 0 END),
+       MAX(gp.net),
+       MIN(gp.net)
+  FROM game_players gp
+  JOIN games g ON g.id = gp.game_id
+"""
+
+_STATS_COLUMNS = (
+    "username, period, net, invested, rebuys, games_played, wins, best_session, worst_session"
+)
+
+# New day for a player starts from the latest earlier running total
+_UPSERT_SERIES = """
+INSERT INTO balance_series (username, date, daily_net, cumulative)
+VALUES (?1, ?2, ?3, ?3 + COALESCE((
+    SELECT cumulative FROM balance_series
+     WHERE username = ?1 AND date < ?2
+     ORDER BY date DESC LIMIT 1
+), 0))
+ON CONFLICT(username, date) DO UPDATE SET
+    daily_net  = daily_net + excluded.daily_net,
+    cumulative = cumulative + excluded.daily_net
+"""
+
+# Shift every later point when a game is back-dated or edited
+_SHIFT_SERIES = """
+UPDATE balance_series SET cumulative = cumulative + ?
+ WHERE username = ? AND date > ?
+"""
+
+
+_BUMP_COUNTERS = """
+UPDATE players SET games_played = games_played + 1, total_rebuys = total_rebuys + ?
+ WHERE username = ?
+"""
+
+
+def month_key(date: str) -> str:
+    """'2024-05-17' -> '2024-05'."""
+    return date[:7]
+
+
+def record_game(db, date: str, winner: str, amount: int, results):
+    """
+    Fold a freshly inserted game into player_stats, balance_series and the
+    leaderboard counters. `results` is an iterable of (username, buyin, rebuys, net).
+    """
+    month = month_key(date)
+    rows = []
+    series = []
+    counters = []
+    for username, buyin, rebuys, net in results:
+        invested = buyin + rebuys * buyin
+        won = 1 if username == winner and amount > 0 else 0
+        for period in (ALL_TIME, month):
+            rows.append((username, period, net, invested, rebuys, won, net, net))
+        series.append((username, date, net))
+        counters.append((rebuys, username))
+    db.executemany(_UPSERT_STATS, rows)
+    db.executemany(_BUMP_COUNTERS, counters)
+    db.executemany(_UPSERT_SERIES, series)
+    db.executemany(_SHIFT_SERIES, [(net, username, date) for username, date, net in series])
+
+
+def record_edit(db, username: str, date: str, delta: int, rebuys_delta: int = 0):
+    """
+    Apply an in-place change of `delta` to one player's net (and
+    `rebuys_delta` to their rebuys) in a game on `date`.
+    """
+    refresh_player(db, username, date)
+    if rebuys_delta:
+        db.execute(
+            "UPDATE players SET total_rebuys = total_rebuys + ? WHERE username = ?",
+            (rebuys_delta, username)
+        )
+    if delta:
+        db.execute(
+            """UPDATE balance_series SET daily_net = daily_net + ?, cumulative = cumulative + ?
+                WHERE username = ? AND date = ?""",
+            (delta, delta, username, date)
+        )
+        db.execute(_SHIFT_SERIES, (delta, username, date))
+
+
+def refresh_player(db, username: str, date: str):
+    """
+    Recompute the all-time and monthly rows for one player from game_players.
+    Used after an in-place edit, where best/worst session can't be adjusted
+    incrementally.
+    """
+    month = month_key(date)
+    db.execute(
+        "DELETE FROM player_stats WHERE username = ? AND period IN (?, ?)",
+        (username, ALL_TIME, month)
+    )
+    db.execute(
+        f"INSERT INTO player_stats ({_STATS_COLUMNS}) "
+        + _STATS_SELECT.format(period_expr="?")
+        + " WHERE gp.username = ? GROUP BY gp.username",
+        (ALL_TIME, username)
+    )
+    db.execute(
+        f"INSERT INTO player_stats ({_STATS_COLUMNS}) "
+        + _STATS_SELECT.format(period_expr="?")
+        + " WHERE gp.username = ? AND g.month = ? GROUP BY gp.username",
+        (month, username, month)
+    )
+
+
+def load_period(db, period: str) -> dict:
+    """
+    Read every player's row for one period as
+    {username: {"net", "invested", "rebuys", "games", "wins", "best", "worst"}}.
+    """
+    rows = db.execute(
+        """SELECT username, net, invested, rebuys, games_played, wins, best_session, worst_session
+             FROM player_stats
+            WHERE period = ?""",
+        (period,)
+    ).fetchall()
+    return {
+        r["username"]: {
+            "net": r["net"],
+            "invested": r["invested"],
+            "rebuys": r["rebuys"],
+            "games": r["games_played"],
+            "wins": r["wins"],
+            "best": r["best_session"],
+            "worst": r["worst_session"],
+        }
+        for r in rows
+    }
+
+
+def load_series(db, username: str):
+    """Return ([date, ...], [cumulative, ...]) for one player's balance chart."""
+    rows = db.execute(
+        "SELECT date, cumulative FROM balance_series WHERE username = ? ORDER BY date",
+        (username,)
+    ).fetchall()
+    return [r["date"] for r in rows], [r["cumulative"] for r in rows]
+
+
+def rebuild(db):
+    """Regenerate every summary table from game_players."""
+    rebuild_player_stats(db)
+    rebuild_balance_series(db)
+    rebuild_player_counters(db)
+
+
+def rebuild_player_counters(db):
+    db.execute("""
+        UPDATE players SET
+            games_played = (SELECT COUNT(DISTINCT game_id) FROM game_players gp
+                             WHERE gp.username = players.username),
+            total_rebuys = (SELECT COALESCE(SUM(rebuys), 0) FROM game_players gp
+                             WHERE gp.username = players.username)
+    """)
+
+
+def rebuild_balance_series(db):
+    db.execute("DELETE FROM balance_series")
+    db.execute("""
+        INSERT INTO balance_series (username, date, daily_net, cumulative)
+        SELECT username, date, daily_net,
+               SUM(daily_net) OVER (PARTITION BY username ORDER BY date)
+          FROM (SELECT gp.username, g.date, SUM(gp.net) AS daily_net
+                  FROM game_players gp
+                  JOIN games g ON g.id = gp.game_id
+                 GROUP BY gp.username, g.date)
+    """)
+
+
+def rebuild_player_stats(db):
+    db.execute("DELETE FROM player_stats")
+    db.execute(
+        f"INSERT INTO player_stats ({_STATS_COLUMNS}) "
+        + _STATS_SELECT.format(period_expr="?")
+        + " GROUP BY gp.username",
+        (ALL_TIME,)
+    )
+    db.execute(
+        f"INSERT INTO player_stats ({_STATS_COLUMNS}) "
+        + _STATS_SELECT.format(period_expr="g.month")
+        + " GROUP BY gp.username, g.month"
+    )
+
+
+def main(argv):
+    if argv[1:] != ["rebuild"]:
+        print("usage: python aggregates.py rebuild", file=sys.stderr)
+        return 2
+    import db as database
+    database.init_db()
+    with database.get_db() as conn:
+        rebuild(conn)
+        conn.commit()
+    print("[aggregates] Rebuilt player_stats, balance_series and leaderboard counters from game_players.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,191 @@
+"""
+Buffered writer for auth_log and admin_log.
+
+Logging used to commit (and fsync) once per event on the request path, so a
+login burst queued every request behind the SQLite write lock. Requests now
+only enqueue the row; a background thread writes queued rows in batches,
+one executemany per table and a single commit, after AUDIT_FLUSH_INTERVAL
+seconds or AUDIT_BATCH_SIZE rows, whichever comes first.
+
+A batch that fails on a locked or busy database (for instance while an
+import batch holds the write lock past the busy timeout) is retried with
+exponential backoff; the queue keeps filling meanwhile. If a batch is
+rejected for any other reason, its rows are retried one at a time, so
+only the bad rows are lost. `failed` counts rows that could not be
+written at all.
+
+The queue holds at most AUDIT_QUEUE_SIZE rows. When it is full, callers wait
+for room (async callers off the event loop), which slows requests down to
+what the disk can take instead of growing memory. `stop()` flushes
+everything queued before it returns; rows still in the queue when the
+process is killed outright are lost. Until `start()` runs (CLI scripts,
+startup hooks) and after `stop()`, rows are written synchronously.
+
+Nothing may rely on reading an event back from the database right after
+logging it; in-memory consumers such as login throttling must be fed at
+the point where the event is logged.
+"""
+import asyncio
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from config import (
+    LOCAL_ZONE,
+    AUDIT_QUEUE_SIZE,
+    AUDIT_BATCH_SIZE,
+    AUDIT_FLUSH_INTERVAL,
+    AUDIT_RETRY_DELAY,
+    AUDIT_RETRY_MAX_DELAY,
+    AUDIT_RETRIES,
+)
+from db import get_db
+
+_INSERTS = {
+    "auth_log": "INSERT INTO auth_log (username, success, ip_address, timestamp) VALUES (?, ?, ?, ?)",
+    "admin_log": "INSERT INTO admin_log (actor, action, target, ip_address, timestamp) VALUES (?, ?, ?, ?, ?)",
+}
+
+_STOP = object()
+
+
+class AuditWriter:
+    def __init__(self, maxsize: int, batch_size: int, interval: float):
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self.written = 0
+        self.batches = 0
+        self.waited = 0
+        self.retries = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+
+    def submit(self, table: str, row: tuple):
+        """Queue one row; blocks while the queue is full."""
+        if table not in _INSERTS:
+            raise ValueError(f"Invalid audit table: {table!r}")
+        if self._thread is None:
+            self._write([(table, row)])
+            return
+        try:
+            self._queue.put_nowait((table, row))
+        except queue.Full:
+            self.waited += 1
+            self._queue.put((table, row))
+
+    async def submit_async(self, table: str, row: tuple):
+        """Like submit(), but waits for room in a thread, not on the event loop."""
+        if table not in _INSERTS:
+            raise ValueError(f"Invalid audit table: {table!r}")
+        if self._thread is None:
+            await asyncio.to_thread(self._write, [(table, row)])
+            return
+        try:
+            self._queue.put_nowait((table, row))
+        except queue.Full:
+            self.waited += 1
+            await asyncio.to_thread(self._queue.put, (table, row))
+
+    def _insert(self, batch):
+        by_table = {}
+        for table, row in batch:
+            by_table.setdefault(table, []).append(row)
+        with get_db() as db:
+            for table, rows in by_table.items():
+                db.executemany(_INSERTS[table], rows)
+
+    def _write(self, batch):
+        delay = AUDIT_RETRY_DELAY
+        for attempt in range(AUDIT_RETRIES + 1):
+            try:
+                self._insert(batch)
+            except sqlite3.OperationalError as e:
+                # locked, busy or I/O trouble: likely to pass, so wait and retry
+                error = e
+                if attempt < AUDIT_RETRIES:
+                    self.retries += 1
+                    time.sleep(delay)
+                    delay = min(delay * 2, AUDIT_RETRY_MAX_DELAY)
+            except Exception as e:
+                # the batch itself was rejected: isolate the bad rows
+                if len(batch) > 1:
+                    for item in batch:
+                        self._write([item])
+                    return
+                error = e
+                break
+            else:
+                self.written += len(batch)
+                self.batches += 1
+                return
+        self.failed += len(batch)
+        print(f"[audit] Failed to write {len(batch)} events: {error!r}")
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._write(batch)
+                    return
+                batch.append(item)
+            self._write(batch)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Flush every queued row, then write synchronously from here on."""
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        # FIFO: the writer sees everything queued before the sentinel
+        self._queue.put(_STOP)
+        thread.join()
+        # rows that raced in after the sentinel
+        leftover = []
+        while True:
+            try:
+                leftover.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if leftover:
+            self._write([item for item in leftover if item is not _STOP])
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "waited": self.waited,
+            "retries": self.retries,
+            "failed": self.failed,
+        }
+
+
+writer = AuditWriter(AUDIT_QUEUE_SIZE, AUDIT_BATCH_SIZE, AUDIT_FLUSH_INTERVAL)
+
+
+def log_admin(actor: str, action: str, target: str = None, ip: str = None):
+    """
+    Queue an admin_log row stamped in LOCAL_ZONE (what log_retention
+    expects). Call it after the action's transaction has committed.
+    """
+    ts = datetime.now(tz=LOCAL_ZONE).strftime("%Y-%m-%d %H:%M:%S")
+    writer.submit("admin_log", (actor, action, target, ip, ts))
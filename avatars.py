@@ -0,0 +1,28 @@
+"""
+Batch avatar lookup for pages that show many players at once.
+
+Collect every username a page needs, then resolve them with a single
+`IN (...)` query instead of one SELECT per award holder.
+"""
+
+NO_PLAYER = "N/A"
+
+
+def load_avatars(db, usernames) -> dict:
+    """Return {username: avatar_path} for the given names that have an avatar."""
+    names = sorted({u for u in usernames if u and u != NO_PLAYER})
+    if not names:
+        return {}
+    rows = db.execute(
+        "SELECT username, avatar_path FROM players WHERE username IN ({seq})".format(
+            seq=",".join("?" * len(names))
+        ),
+        tuple(names)
+    ).fetchall()
+    return {r["username"]: r["avatar_path"] for r in rows if r["avatar_path"]}
+
+
+def fill_avatars(ctx: dict, fields: dict, avatar_of: dict):
+    """Set ctx[avatar_key] for each {avatar_key: username_key} in `fields`."""
+    for avatar_key, user_key in fields.items():
+        ctx[avatar_key] = avatar_of.get(ctx.get(user_key))
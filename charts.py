@@ -0,0 +1,71 @@
+"""
+Downsampling for the balance charts.
+
+Players with thousands of sessions would otherwise ship every point to
+Chart.js. `downsample` caps a (dates, values) series at `max_points` using
+either weekly buckets or largest-triangle-three-buckets (LTTB), which keeps
+the visual shape (peaks and dips) of the line.
+"""
+from datetime import date as Date
+
+MODES = ("off", "weekly", "lttb")
+
+
+def weekly(dates, values):
+    """Keep the last point of each ISO week."""
+    out_dates, out_values = [], []
+    last_week = None
+    for d, v in zip(dates, values):
+        week = Date.fromisoformat(d).isocalendar()[:2]
+        if week == last_week:
+            out_dates[-1], out_values[-1] = d, v
+        else:
+            out_dates.append(d)
+            out_values.append(v)
+            last_week = week
+    return out_dates, out_values
+
+
+def lttb(dates, values, threshold: int):
+    """Largest-triangle-three-buckets; always keeps the first and last point."""
+    n = len(values)
+    if threshold >= n or threshold < 3:
+        return list(dates), list(values)
+
+    xs = [Date.fromisoformat(d).toordinal() for d in dates]
+    keep = [0]
+    bucket = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket) + 1
+        end = int((i + 1) * bucket) + 1
+        # average of the next bucket is the third corner of the triangle
+        next_start = end
+        next_end = min(int((i + 2) * bucket) + 1, n)
+        span = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / span
+        avg_y = sum(values[next_start:next_end]) / span
+
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs(
+                (xs[a] - avg_x) * (values[j] - values[a])
+                - (xs[a] - xs[j]) * (avg_y - values[a])
+            )
+            if area > best_area:
+                best, best_area = j, area
+        keep.append(best)
+        a = best
+    keep.append(n - 1)
+    return [dates[i] for i in keep], [values[i] for i in keep]
+
+
+def downsample(dates, values, mode: str, max_points: int):
+    """Apply `mode` only when the series is longer than `max_points`."""
+    if mode == "off" or not max_points or len(values) <= max_points:
+        return dates, values
+    if mode == "weekly":
+        dates, values = weekly(dates, values)
+        if len(values) <= max_points:
+            return dates, values
+    return lttb(dates, values, max_points)
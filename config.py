@@ -1,5 +1,4 @@
 import os
-import secrets
 from datetime import timezone
 try:
     from zoneinfo import ZoneInfo
@@ -7,9 +6,102 @@ except ImportError:
     ZoneInfo = None
 
 BUYIN_DEFAULT   = 100
-SESSION_SECRET  = os.getenv("SESSION_SECRET") or secrets.token_hex(32)
 DATABASE_URL    = os.getenv("DATABASE_URL", "/app/data/poker.db")
 
+
+# Cookies must verify in every worker: use SESSION_SECRET, or a random
+# secret persisted next to the database when the app first starts
+# (security.session_secret(); never at import, so image builds stay clean)
+SESSION_SECRET_FILE = os.getenv(
+    "SESSION_SECRET_FILE", os.path.join(os.path.dirname(DATABASE_URL), "session_secret")
+)
+SESSION_SECRET  = os.getenv("SESSION_SECRET", "")
+
+# Rate-limit counters: "sqlite://" (app database, shared by all workers) or "memory://"
+RATE_LIMIT_STORAGE  = os.getenv("RATE_LIMIT_STORAGE", "sqlite://")
+
+# SQLite connection pool & tuning
+DB_POOL_SIZE        = int(os.getenv("DB_POOL_SIZE", "8"))            # idle connections kept open
+DB_CACHE_SIZE_KB    = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))    # page cache per connection
+DB_MMAP_SIZE        = int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024)))
+DB_STATEMENT_CACHE  = int(os.getenv("DB_STATEMENT_CACHE", "256"))    # prepared statements per connection
+DB_ASYNC_WORKERS    = int(os.getenv("DB_ASYNC_WORKERS", "4"))        # threads behind db.run_db()
+DB_INIT_LOCK_TIMEOUT = float(os.getenv("DB_INIT_LOCK_TIMEOUT", "600"))  # seconds a starting worker waits for migrations
+
+# Game history pagination
+HISTORY_PAGE_SIZE     = int(os.getenv("HISTORY_PAGE_SIZE", "50"))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "200"))
+
+# Leaderboard rows per page, and the highest page number accepted
+LEADERBOARD_PAGE_SIZE = int(os.getenv("LEADERBOARD_PAGE_SIZE", "50"))
+LEADERBOARD_MAX_PAGE  = int(os.getenv("LEADERBOARD_MAX_PAGE", "10000"))
+
+# Balance charts: "off", "weekly" or "lttb" once a series exceeds CHART_MAX_POINTS
+CHART_DOWNSAMPLE      = os.getenv("CHART_DOWNSAMPLE", "lttb")
+CHART_MAX_POINTS      = int(os.getenv("CHART_MAX_POINTS", "500"))
+
+# Bulk game import: games per write transaction
+IMPORT_BATCH_SIZE     = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+
+# CSV export: rows fetched per round trip
+EXPORT_BATCH_SIZE     = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# bcrypt runs on its own thread pool; this caps concurrent hashes
+HASH_WORKERS        = int(os.getenv("HASH_WORKERS", "2"))
+
+# Logged-in user lookups (per worker process)
+USER_CACHE_SIZE     = int(os.getenv("USER_CACHE_SIZE", "256"))
+USER_CACHE_TTL      = float(os.getenv("USER_CACHE_TTL", "5"))        # seconds
+
+# Dashboard/profile summaries; invalidated by data version, TTL only bounds memory
+SUMMARY_CACHE_SIZE  = int(os.getenv("SUMMARY_CACHE_SIZE", "256"))
+SUMMARY_CACHE_TTL   = float(os.getenv("SUMMARY_CACHE_TTL", "600"))   # seconds
+
+# Shared stats/leaderboard/history contexts; invalidated by the global data version
+PAGE_CACHE_SIZE     = int(os.getenv("PAGE_CACHE_SIZE", "512"))
+PAGE_CACHE_TTL      = float(os.getenv("PAGE_CACHE_TTL", "300"))      # seconds
+
+# Jinja2: bytecode cache directory ("" = system temp dir), reload on edit, precompile at startup
+TEMPLATE_CACHE_DIR   = os.getenv("TEMPLATE_CACHE_DIR", "")
+TEMPLATE_AUTO_RELOAD = os.getenv("TEMPLATE_AUTO_RELOAD", "0") == "1"
+TEMPLATE_PRECOMPILE  = os.getenv("TEMPLATE_PRECOMPILE", "1") == "1"
+
+# Event-loop lag monitor: sample interval (0 = off) and the lag worth a log line, in seconds
+LOOP_LAG_INTERVAL   = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))
+LOOP_LAG_WARN       = float(os.getenv("LOOP_LAG_WARN", "0.1"))
+
+# Login lockout (see lockout.py): failures allowed per username and per IP
+# within the window (0 = no limit), window in seconds, and tracked keys
+LOCKOUT_WINDOW        = float(os.getenv("LOCKOUT_WINDOW", "900"))
+LOCKOUT_USER_FAILURES = int(os.getenv("LOCKOUT_USER_FAILURES", "10"))
+LOCKOUT_IP_FAILURES   = int(os.getenv("LOCKOUT_IP_FAILURES", "50"))
+LOCKOUT_MAX_KEYS      = int(os.getenv("LOCKOUT_MAX_KEYS", "100000"))
+
+# Buffered audit log writer (see audit.py): max queued events, events per
+# commit, and the longest an event waits before it is flushed, in seconds
+AUDIT_QUEUE_SIZE     = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_BATCH_SIZE     = int(os.getenv("AUDIT_BATCH_SIZE", "200"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "0.05"))
+# A batch that hits a locked or busy database is retried with exponential
+# backoff (first delay, cap, attempts) before its rows count as failed
+AUDIT_RETRY_DELAY     = float(os.getenv("AUDIT_RETRY_DELAY", "0.1"))
+AUDIT_RETRY_MAX_DELAY = float(os.getenv("AUDIT_RETRY_MAX_DELAY", "5"))
+AUDIT_RETRIES         = int(os.getenv("AUDIT_RETRIES", "10"))
+
+# Scheduler: seconds between Player of the Month finalization runs (0 = off)
+POTM_FINALIZE_INTERVAL = float(os.getenv("POTM_FINALIZE_INTERVAL", "3600"))
+
+# auth_log/admin_log retention (see log_retention.py); 0 disables a limit
+AUTH_LOG_RETENTION_DAYS  = int(os.getenv("AUTH_LOG_RETENTION_DAYS", "90"))
+AUTH_LOG_MAX_ROWS        = int(os.getenv("AUTH_LOG_MAX_ROWS", "1000000"))
+ADMIN_LOG_RETENTION_DAYS = int(os.getenv("ADMIN_LOG_RETENTION_DAYS", "365"))
+ADMIN_LOG_MAX_ROWS       = int(os.getenv("ADMIN_LOG_MAX_ROWS", "100000"))
+LOG_ARCHIVE_DIR          = os.getenv(
+    "LOG_ARCHIVE_DIR", os.path.join(os.path.dirname(DATABASE_URL), "archive")
+)
+RETENTION_BATCH_SIZE     = int(os.getenv("RETENTION_BATCH_SIZE", "1000"))
+RETENTION_INTERVAL       = float(os.getenv("RETENTION_INTERVAL", "86400"))  # seconds, 0 = off
+
 # Time zone config
 TIME_ZONE       = os.getenv("TIME_ZONE", "UTC")
 if ZoneInfo:
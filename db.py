@@ -1,6 +1,18 @@
+import asyncio
 import os
+import queue
 import sqlite3
-from config import DATABASE_URL
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    DATABASE_URL,
+    DB_ASYNC_WORKERS,
+    DB_POOL_SIZE,
+    DB_CACHE_SIZE_KB,
+    DB_MMAP_SIZE,
+    DB_STATEMENT_CACHE,
+    DB_INIT_LOCK_TIMEOUT,
+)
+import aggregates
 
 # Whitelist your actual tables to prevent injection in PRAGMA calls
 ALLOWED_TABLES = {
@@ -10,19 +22,103 @@ ALLOWED_TABLES = {
     "game_players",
     "admin_log",
     "potm_history",
+    "player_stats",
+    "balance_series",
+    "data_versions",
+    "rate_limits",
+    "auth_log_daily",
+    "maintenance_state",
 }
 
-def get_db():
-    conn = sqlite3.connect(DATABASE_URL)
+# Idle connections, most recently returned first so hot caches get reused
+_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+
+
+def _connect():
+    # A pooled connection is only ever used by one thread at a time, but it
+    # may be checked out by a different worker thread on each request.
+    conn = sqlite3.connect(
+        DATABASE_URL,
+        check_same_thread=False,
+        cached_statements=DB_STATEMENT_CACHE,
+    )
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA cache_size = {-DB_CACHE_SIZE_KB:d}")
+    conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE:d}")
     return conn
 
+
+class _PooledConnection:
+    """
+    `with get_db() as db:` checks a connection out of the pool and hands it
+    back on exit, committing on success and rolling back on error exactly
+    like `with sqlite3.connect(...)` does.
+    """
+
+    def __enter__(self):
+        try:
+            self.conn = _pool.get_nowait()
+        except queue.Empty:
+            self.conn = _connect()
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        conn = self.conn
+        try:
+            if exc_type is None:
+                conn.commit()
+            else:
+                conn.rollback()
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                _pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+        return False
+
+
+def get_db():
+    return _PooledConnection()
+
+
+# Threads that run database work for async handlers, off the event loop
+_executor = ThreadPoolExecutor(max_workers=DB_ASYNC_WORKERS, thread_name_prefix="sqlite")
+
+
+async def run_in_pool(fn, *args):
+    """
+    Run fn(*args) on the database thread pool, for blocking code that opens
+    its own connections (see rate_limit.limit).
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, fn, *args)
+
+
+def _run_with_db(fn, args):
+    with get_db() as db:
+        return fn(db, *args)
+
+
+async def run_db(fn, *args):
+    """
+    Async counterpart of `with get_db() as db: return fn(db, *args)`.
+    fn runs on the database thread pool with a pooled connection (same
+    sqlite3.Row results, same commit/rollback on exit), so async handlers
+    never block the event loop on disk I/O.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, _run_with_db, fn, args)
+
 def column_exists(db, table: str, column: str) -> bool:
     # Ensure table is known
     if table not in ALLOWED_TABLES:
         raise ValueError(f"Invalid table name: {table!r}")
-    # PRAGMA table_info can’t parameterize the object, but whitelist defangs injections
-    result = db.execute(f"PRAGMA table_info({table})").fetchall()
+    # PRAGMA table_xinfo can’t parameterize the object, but whitelist defangs injections.
+    # table_xinfo (unlike table_info) also lists generated columns.
+    result = db.execute(f"PRAGMA table_xinfo({table})").fetchall()
     return any(col["name"] == column for col in result)
 
 def init_db():
@@ -30,6 +126,17 @@ def init_db():
         os.makedirs(os.path.dirname(DATABASE_URL), exist_ok=True)
 
     with get_db() as db:
+        # Every worker runs this at startup. Wait as long as a backfill may
+        # take for the write lock instead of the usual 5 seconds.
+        db.execute(f"PRAGMA busy_timeout = {DB_INIT_LOCK_TIMEOUT * 1000:.0f}")
+        # WAL lets readers keep going while a game is being written.
+        # The journal mode is persistent, so setting it once here is enough.
+        db.execute("PRAGMA journal_mode = WAL")
+        # The whole schema check runs in one write transaction: the first
+        # worker migrates and backfills, the others then find nothing to do
+        # instead of racing on ALTER TABLE.
+        db.execute("BEGIN IMMEDIATE")
+
         # Players table
         db.execute("""
         CREATE TABLE IF NOT EXISTS players (
@@ -40,8 +147,15 @@ def init_db():
             is_admin INTEGER DEFAULT 0,
             must_set_password INTEGER DEFAULT 0,
             avatar_path TEXT,
-            password_changed_at TEXT
+            password_changed_at TEXT,
+            games_played INTEGER NOT NULL DEFAULT 0,
+            total_rebuys INTEGER NOT NULL DEFAULT 0
         )""")
+        # Leaderboard counters, maintained on write (see aggregates.py)
+        if not column_exists(db, "players", "games_played"):
+            db.execute("ALTER TABLE players ADD COLUMN games_played INTEGER NOT NULL DEFAULT 0")
+            db.execute("ALTER TABLE players ADD COLUMN total_rebuys INTEGER NOT NULL DEFAULT 0")
+            aggregates.rebuild_player_counters(db)
 
         # Auth log table for login attempts
         db.execute("""
@@ -61,8 +175,16 @@ def init_db():
             winner TEXT NOT NULL,
             amount INTEGER NOT NULL,
             rebuys INTEGER NOT NULL DEFAULT 0,
-            buyin INTEGER DEFAULT 0
+            buyin INTEGER DEFAULT 0,
+            month TEXT GENERATED ALWAYS AS (substr(date, 1, 7)) VIRTUAL
         )""")
+        # Month key ("YYYY-MM") as an indexable column, so monthly queries
+        # don't have to wrap `date` in strftime()
+        if not column_exists(db, "games", "month"):
+            db.execute(
+                "ALTER TABLE games ADD COLUMN month TEXT "
+                "GENERATED ALWAYS AS (substr(date, 1, 7)) VIRTUAL"
+            )
 
         # GamePlayers table
         db.execute("""
@@ -100,6 +222,80 @@ def init_db():
             username TEXT NOT NULL,
             avatar_path TEXT
         )""")
+        # One POTM per month: drop duplicates left by the old page-render
+        # insert before enforcing it
+        db.execute("""
+        DELETE FROM potm_history
+         WHERE id NOT IN (SELECT MIN(id) FROM potm_history GROUP BY month)
+        """)
+        db.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_potm_history_month
+        ON potm_history(month)
+        """)
+
+        # Per-player aggregates, maintained on write (see aggregates.py)
+        db.execute("""
+        CREATE TABLE IF NOT EXISTS player_stats (
+            username TEXT NOT NULL,
+            period TEXT NOT NULL,
+            net INTEGER NOT NULL DEFAULT 0,
+            invested INTEGER NOT NULL DEFAULT 0,
+            rebuys INTEGER NOT NULL DEFAULT 0,
+            games_played INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            best_session INTEGER,
+            worst_session INTEGER,
+            PRIMARY KEY (username, period)
+        )""")
+        # Per-player running balance by day, for the dashboard charts
+        db.execute("""
+        CREATE TABLE IF NOT EXISTS balance_series (
+            username TEXT NOT NULL,
+            date TEXT NOT NULL,
+            daily_net INTEGER NOT NULL,
+            cumulative INTEGER NOT NULL,
+            PRIMARY KEY (username, date)
+        )""")
+
+        # Cache version stamps, bumped by writers (see versions.py)
+        db.execute("""
+        CREATE TABLE IF NOT EXISTS data_versions (
+            key TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )""")
+
+        # Rate-limit counters shared by all workers (see rate_limit.py)
+        db.execute("""
+        CREATE TABLE IF NOT EXISTS rate_limits (
+            key TEXT PRIMARY KEY,
+            count INTEGER NOT NULL,
+            expires_at REAL NOT NULL
+        )""")
+
+        # Daily login rollups, kept after raw auth_log rows are pruned
+        # (see log_retention.py)
+        db.execute("""
+        CREATE TABLE IF NOT EXISTS auth_log_daily (
+            day TEXT NOT NULL,
+            username TEXT NOT NULL,
+            ip_address TEXT NOT NULL,
+            attempts INTEGER NOT NULL,
+            failures INTEGER NOT NULL,
+            PRIMARY KEY (day, username, ip_address)
+        )""")
+        # Watermarks and other bookkeeping for background jobs
+        db.execute("""
+        CREATE TABLE IF NOT EXISTS maintenance_state (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )""")
+
+        # Backfill once for databases that predate the tables
+        has_games = db.execute("SELECT 1 FROM game_players LIMIT 1").fetchone() is not None
+        if has_games and db.execute("SELECT 1 FROM player_stats LIMIT 1").fetchone() is None:
+            aggregates.rebuild_player_stats(db)
+        if has_games and db.execute("SELECT 1 FROM balance_series LIMIT 1").fetchone() is None:
+            aggregates.rebuild_balance_series(db)
 
         # Indexes for performance
         db.execute("""
@@ -111,8 +307,51 @@ def init_db():
         ON auth_log(timestamp)
         """)
         db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_admin_log_timestamp
+        ON admin_log(timestamp)
+        """)
+        db.execute("""
         CREATE INDEX IF NOT EXISTS idx_players_username 
         ON players(username)
         """)
+        # One index per leaderboard sort order; username breaks ties so
+        # OFFSET pages are stable
+        db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_players_balance
+        ON players(balance DESC, username)
+        """)
+        db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_players_games_played
+        ON players(games_played DESC, username)
+        """)
+        db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_players_total_rebuys
+        ON players(total_rebuys DESC, username)
+        """)
+        db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_game_players_username_game
+        ON game_players(username, game_id)
+        """)
+        db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_game_players_game
+        ON game_players(game_id)
+        """)
+        db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_games_winner_amount
+        ON games(winner, amount)
+        """)
+        db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_games_date
+        ON games(date)
+        """)
+        db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_games_month
+        ON games(month, amount)
+        """)
+        db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_player_stats_period
+        ON player_stats(period, net)
+        """)
 
-        db.commit()
\ No newline at end of file
+        db.commit()
+        db.execute("PRAGMA busy_timeout = 5000")
\ No newline at end of file
@@ -1,4 +1,6 @@
 from fastapi import Request, HTTPException, Depends
+from cache import TTLCache
+from config import USER_CACHE_SIZE, USER_CACHE_TTL
 from db import get_db
 import secrets
 
@@ -7,6 +9,9 @@ CSRF_SESSION_KEY = "csrf_token"
 CSRF_FORM_FIELD = "csrf_token"
 CSRF_HEADER = "x-csrf-token"
 
+# username -> players row
+_user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
 async def generate_csrf(request: Request) -> str:
     """
     Ensure there's a CSRF token in the session and return it.
@@ -31,10 +36,34 @@ async def verify_csrf(request: Request):
 
 
 def get_current_user(request: Request):
+    """
+    Return the logged-in player's row, loading it at most once per request.
+    The row is kept on request.state and in a short-TTL cache shared across
+    requests; call invalidate_user() after changing a player's row.
+    """
     username = request.session.get("user")
     if not username:
         return None
-    with get_db() as db:
-        return db.execute(
-            "SELECT * FROM players WHERE username = ?", (username,)
-        ).fetchone()
+    user = getattr(request.state, "current_user", None)
+    if user is not None and user["username"] == username:
+        return user
+    user = _user_cache.get(username)
+    if user is None:
+        with get_db() as db:
+            user = db.execute(
+                "SELECT * FROM players WHERE username = ?", (username,)
+            ).fetchone()
+        if user is not None:
+            _user_cache.set(username, user)
+    request.state.current_user = user
+    return user
+
+
+def user_cache_stats() -> dict:
+    return _user_cache.stats()
+
+
+def invalidate_user(*usernames):
+    """Drop cached player rows after a password, admin, balance or avatar change."""
+    for username in usernames:
+        _user_cache.pop(username)
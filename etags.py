@@ -0,0 +1,66 @@
+"""
+ETags for the read-only data pages.
+
+A page's ETag is a hash of the data version it was built from (see
+versions.py), the viewer (pages show the logged-in user and admin links,
+and embed the session's CSRF token), any route-specific parts such as
+query parameters, and a fingerprint of the templates so a deploy changes
+every tag. Routes compute it after the auth check and answer a matching
+If-None-Match with 304 before running any other query or rendering.
+
+The responses carry `Cache-Control: private, no-cache` (see
+middleware.AppMiddleware): browsers may keep a copy but must revalidate it
+every time, and shared caches never store it.
+"""
+import hashlib
+from pathlib import Path
+
+from starlette.responses import Response
+
+from templating import TEMPLATES_DIR
+
+
+def _fingerprint(directory: Path) -> str:
+    """Same value in every worker process as long as the templates are unchanged."""
+    h = hashlib.sha1()
+    for path in sorted(directory.rglob("*")):
+        if path.is_file():
+            stat = path.stat()
+            h.update(f"{path.relative_to(directory)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return h.hexdigest()[:12]
+
+
+TEMPLATES_FINGERPRINT = _fingerprint(TEMPLATES_DIR)
+
+
+def page_etag(request, user, version: int, *parts) -> str:
+    """Weak ETag for a page rendered for `user` (None if anonymous) from data at `version`."""
+    raw = "|".join(str(p) for p in (
+        TEMPLATES_FINGERPRINT,
+        user["username"] if user else "",
+        user["is_admin"] if user else "",
+        request.session.get("csrf_token", ""),
+        version,
+        *parts,
+    ))
+    return 'W/"%s"' % hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+
+def is_fresh(request, etag: str) -> bool:
+    """True when If-None-Match already names `etag` (weak comparison)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def tagged(response, etag: str):
+    response.headers["ETag"] = etag
+    return response
@@ -0,0 +1,205 @@
+"""
+Bulk import of historical games from CSV or JSONL.
+
+CSV: one row per player result, with a header row
+
+    game,date,buyin,username,cashout,rebuys
+    1,2023-01-14,100,alice,250,1
+    1,2023-01-14,100,bob,50,0
+
+The rows of one game share a `game` id and must be consecutive; an id that
+comes back after other rows, or whose rows disagree on date or buy-in, is
+rejected rather than split or merged.
+
+JSONL: one game per line
+
+    {"date": "2023-01-14", "buyin": 100, "players": [{"username": "alice", "cashout": 250, "rebuys": 1}, ...]}
+
+Every game is validated with the same rules as the add-game form. Invalid
+games are reported and skipped; the rest are written in transactions of
+`batch_size` games, each carrying its own balance update, so every
+committed batch is complete. If a batch fails, it is rolled back, the
+import stops and the report says how far it got.
+
+    python game_import.py games.csv [--batch-size 500]
+"""
+import argparse
+import csv
+import json
+import sys
+from collections import defaultdict
+
+import ledger
+import versions
+from config import IMPORT_BATCH_SIZE
+
+FORMATS = ("csv", "jsonl")
+
+
+def detect_format(filename: str) -> str:
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson", ".json")):
+        return "jsonl"
+    raise ValueError("Unsupported file type; use .csv or .jsonl")
+
+
+def _parse_csv(stream):
+    """Yield (line_no, game, error) per game; `game` holds raw strings."""
+    reader = csv.DictReader(stream)
+    missing = {"game", "date", "buyin", "username", "cashout", "rebuys"} - set(reader.fieldnames or ())
+    if missing:
+        yield 1, None, f"Missing CSV columns: {', '.join(sorted(missing))}"
+        return
+
+    game_id = game = start = error = None
+    seen = set()
+    for row in reader:
+        row_id = (row["game"] or "").strip()
+        date, buyin = (row["date"] or "").strip(), (row["buyin"] or "").strip()
+        if row_id != game_id or game is None:
+            if game is not None:
+                yield start, game, error
+            game_id, start, error = row_id, reader.line_num, None
+            game = {"date": date, "buyin": buyin, "players": []}
+            if not row_id:
+                error = f"Line {reader.line_num}: missing game id."
+            elif row_id in seen:
+                error = f"Line {reader.line_num}: game {row_id} continues after other rows."
+            seen.add(row_id)
+        elif (date, buyin) != (game["date"], game["buyin"]):
+            error = error or f"Line {reader.line_num}: date or buy-in differs within game {row_id}."
+        if not row["username"]:
+            error = error or f"Line {reader.line_num}: missing username."
+            continue
+        game["players"].append((
+            row["username"].strip(),
+            (row["cashout"] or "").strip(),
+            (row["rebuys"] or "0").strip(),
+        ))
+    if game is not None:
+        yield start, game, error
+
+
+def _parse_jsonl(stream):
+    """Yield (line_no, game, error) per non-blank line."""
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            raw = json.loads(line)
+            game = {
+                "date": str(raw["date"]),
+                "buyin": str(raw["buyin"]),
+                "players": [
+                    (str(p["username"]), str(p["cashout"]), str(p.get("rebuys", 0)))
+                    for p in raw["players"]
+                ],
+            }
+        except (ValueError, KeyError, TypeError) as e:
+            yield line_no, None, f"Malformed game: {e}"
+            continue
+        yield line_no, game, None
+
+
+def _validate(game: dict, known_players: set):
+    date = ledger.validate_date(game["date"])
+    buyin = ledger.validate_buyin(game["buyin"])
+    selected, seen = [], set()
+    for username, cash_str, reb_str in game["players"]:
+        if username not in known_players:
+            raise ledger.GameValidationError(f"Unknown player '{username}'.")
+        if username in seen:
+            raise ledger.GameValidationError(f"Player '{username}' listed twice.")
+        seen.add(username)
+        cash, rebuys = ledger.validate_result(cash_str, reb_str)
+        selected.append((username, cash, rebuys))
+    ledger.validate_game(buyin, selected)
+    return date, buyin, selected
+
+
+def _commit_batch(db, balance_deltas: dict):
+    """Apply the batch's balances in one UPDATE and commit it with its games."""
+    ledger.apply_balances(db, balance_deltas.items())
+    versions.bump_players(db, *balance_deltas)
+    db.commit()
+
+
+def import_games(db, stream, fmt: str, batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    """
+    Stream games from a text file object into the database.
+    Returns {"imported": n, "errors": [{"line", "error"}], "players": [...],
+    "aborted": bool}; `imported` and `players` cover committed batches only.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}")
+    batch_size = max(1, batch_size)
+    parse = _parse_csv if fmt == "csv" else _parse_jsonl
+    known_players = {r["username"] for r in db.execute("SELECT username FROM players").fetchall()}
+
+    balance_deltas = defaultdict(int)
+    players = set()
+    imported = 0
+    errors = []
+    in_batch = 0
+    line_no = 0
+
+    try:
+        for line_no, game, error in parse(stream):
+            if error is None:
+                try:
+                    date, buyin, selected = _validate(game, known_players)
+                except ledger.GameValidationError as e:
+                    error = str(e)
+            if error is not None:
+                errors.append({"line": line_no, "error": error})
+                continue
+
+            if in_batch == 0:
+                db.execute("BEGIN IMMEDIATE")
+            ledger.insert_game(db, date, buyin, selected, update_balances=False)
+            for username, _, _, net in ledger.game_results(buyin, selected):
+                balance_deltas[username] += net
+            in_batch += 1
+            if in_batch >= batch_size:
+                _commit_batch(db, balance_deltas)
+                imported += in_batch
+                players.update(balance_deltas)
+                balance_deltas.clear()
+                in_batch = 0
+
+        if in_batch:
+            _commit_batch(db, balance_deltas)
+            imported += in_batch
+            players.update(balance_deltas)
+    except Exception as e:
+        # Earlier batches stay committed, each with its balances
+        db.rollback()
+        errors.append({"line": line_no, "error": f"Import stopped, current batch rolled back: {e}"})
+        return {"imported": imported, "errors": errors, "players": sorted(players), "aborted": True}
+
+    return {"imported": imported, "errors": errors, "players": sorted(players), "aborted": False}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import historical games from CSV or JSONL.")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS)
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    import db as database
+    database.init_db()
+    fmt = args.format or detect_format(args.path)
+    with open(args.path, encoding="utf-8-sig", newline="") as stream, database.get_db() as conn:
+        report = import_games(conn, stream, fmt, args.batch_size)
+
+    for err in report["errors"]:
+        print(f"line {err['line']}: {err['error']}", file=sys.stderr)
+    print(f"[import] Imported {report['imported']} games, {len(report['errors'])} rejected.")
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Game write path shared by the add-game form and the bulk importer.
+
+Validation raises GameValidationError with the same messages the form has
+always shown; routers turn it into a 400. `insert_game` never opens or
+commits a transaction itself, so callers can batch several games into one.
+"""
+import re
+from datetime import datetime
+
+import aggregates
+import versions
+
+DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+INT_PATTERN = re.compile(r'^\d+$')
+
+
+class GameValidationError(ValueError):
+    pass
+
+
+def validate_date(date: str) -> str:
+    if not DATE_PATTERN.match(date):
+        raise GameValidationError("Invalid date format. Use YYYY-MM-DD.")
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        raise GameValidationError("Date out of range.")
+    return date
+
+
+def validate_buyin(buyin: str) -> int:
+    if not INT_PATTERN.match(buyin):
+        raise GameValidationError("Invalid buy-in amount.")
+    buyin_val = int(buyin)
+    if buyin_val <= 0:
+        raise GameValidationError("Buy-in must be positive.")
+    return buyin_val
+
+
+def validate_result(cash_str: str, reb_str: str):
+    """Parse one player's cash-out and rebuys."""
+    if not INT_PATTERN.match(cash_str) or not INT_PATTERN.match(reb_str):
+        raise GameValidationError("Invalid numeric fields.")
+    cash = int(cash_str)
+    rebuys = int(reb_str)
+    if cash < 0 or rebuys < 0:
+        raise GameValidationError("Cash-out and rebuys must be non-negative.")
+    return cash, rebuys
+
+
+def validate_game(buyin: int, selected):
+    """`selected` is a list of (username, cashout, rebuys)."""
+    if not selected:
+        raise GameValidationError("Select at least one player.")
+    total_rebuys = sum(rebuys for _, _, rebuys in selected)
+    total_cashout = sum(cash for _, cash, _ in selected)
+    expected_total = buyin * len(selected) + buyin * total_rebuys
+    if total_cashout > expected_total:
+        raise GameValidationError(f"Total cash-out {total_cashout} exceeds max {expected_total}.")
+
+
+def game_results(buyin: int, selected):
+    """(username, cashout, rebuys) -> (username, cashout, rebuys, net)."""
+    return [
+        (username, cash, rebuys, cash - buyin * (1 + rebuys))
+        for username, cash, rebuys in selected
+    ]
+
+
+def apply_balances(db, deltas):
+    """Add each (username, delta) to players.balance in a single statement."""
+    deltas = list(deltas)
+    if not deltas:
+        return
+    db.execute(
+        "UPDATE players SET balance = balance + CASE username {cases} END "
+        "WHERE username IN ({seq})".format(
+            cases=" ".join("WHEN ? THEN ?" for _ in deltas),
+            seq=",".join("?" * len(deltas)),
+        ),
+        [v for username, delta in deltas for v in (username, delta)]
+        + [username for username, _ in deltas]
+    )
+
+
+def insert_game(db, date: str, buyin: int, selected, update_balances: bool = True) -> int:
+    """
+    Write one validated game: the games row, every game_players row, the
+    balance changes, the summary tables and the players' data versions. `selected` is a list of
+    (username, cashout, rebuys). The caller owns the transaction.
+    Pass update_balances=False to apply balances later in bulk.
+    """
+    results = game_results(buyin, selected)
+    # Winner is the highest cash-out; ties go to the first player listed
+    winner, _, _, amount = max(results, key=lambda r: r[1])
+    total_rebuys = sum(rebuys for _, _, rebuys, _ in results)
+
+    game_id = db.execute(
+        "INSERT INTO games (date, winner, amount, rebuys, buyin) VALUES (?, ?, ?, ?, ?)",
+        (date, winner, amount, total_rebuys, buyin)
+    ).lastrowid
+    db.executemany(
+        "INSERT INTO game_players (game_id, username, buyin, rebuys, cashout, net) VALUES (?, ?, ?, ?, ?, ?)",
+        [(game_id, username, buyin, rebuys, cash, net) for username, cash, rebuys, net in results]
+    )
+    if update_balances:
+        apply_balances(db, [(username, net) for username, _, _, net in results])
+    aggregates.record_game(
+        db, date, winner, amount,
+        [(username, buyin, rebuys, net) for username, _, rebuys, net in results]
+    )
+    versions.bump_players(db, *(username for username, _, _, _ in results))
+    return game_id
@@ -0,0 +1,122 @@
+"""
+Brute-force protection for /login.
+
+Failed logins are counted per username and per client IP over a sliding
+window of LOCKOUT_WINDOW seconds. Each key keeps only the timestamps of its
+last `limit` failures in a fixed-size deque: the key is locked while the
+oldest of those is still inside the window. Keys live in an LRU of at most
+LOCKOUT_MAX_KEYS entries, so a spray of random usernames cannot grow memory
+without bound.
+
+Locked-out attempts are rejected before the player lookup and before any
+bcrypt work, and are not counted again, so the lock ends one window after
+the failures that caused it. A successful login clears the username's
+failures (not the IP's).
+
+State is per worker process and rebuilt from auth_log at startup; with
+several workers the effective limit is up to WEB_CONCURRENCY times higher.
+Failures are recorded where they are logged (routers/auth.py), so buffered
+auth_log rows that are not flushed yet are counted too.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+
+from config import LOCKOUT_WINDOW, LOCKOUT_USER_FAILURES, LOCKOUT_IP_FAILURES, LOCKOUT_MAX_KEYS
+
+
+class SlidingWindow:
+    """Timestamps of the last `limit` failures per key, LRU-bounded."""
+
+    def __init__(self, limit: int, window: float, maxkeys: int):
+        self.limit = limit
+        self.window = window
+        self.maxkeys = maxkeys
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key, ts: float):
+        if self.limit <= 0:
+            return
+        with self._lock:
+            failures = self._data.get(key)
+            if failures is None:
+                failures = self._data[key] = deque(maxlen=self.limit)
+                while len(self._data) > self.maxkeys:
+                    self._data.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._data.move_to_end(key)
+            failures.append(ts)
+
+    def retry_after(self, key, now: float) -> float:
+        """Seconds until `key` may try again; 0 if it is not locked."""
+        with self._lock:
+            failures = self._data.get(key)
+            if failures is None or len(failures) < self.limit:
+                return 0.0
+            return max(0.0, failures[0] + self.window - now)
+
+    def discard(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class LockoutTracker:
+    def __init__(self, window: float, user_limit: int, ip_limit: int, maxkeys: int):
+        self.window = window
+        self.users = SlidingWindow(user_limit, window, maxkeys)
+        self.ips = SlidingWindow(ip_limit, window, maxkeys)
+        self.rejected = 0
+
+    def retry_after(self, username: str, ip: str, now: float = None) -> float:
+        now = time.time() if now is None else now
+        wait = max(self.users.retry_after(username, now), self.ips.retry_after(ip, now))
+        if wait:
+            self.rejected += 1
+        return wait
+
+    def record(self, username: str, ip: str, success: bool, now: float = None):
+        if success:
+            self.users.discard(username)
+            return
+        now = time.time() if now is None else now
+        self.users.add(username, now)
+        self.ips.add(ip, now)
+
+    def rebuild(self, db, now: float = None) -> int:
+        """Replay the last window of auth_log; returns the rows read."""
+        now = time.time() if now is None else now
+        # auth_log timestamps are naive UTC isoformat strings
+        since = datetime.fromtimestamp(now - self.window, tz=timezone.utc).replace(tzinfo=None)
+        self.users.clear()
+        self.ips.clear()
+        rows = db.execute(
+            "SELECT username, ip_address, success, timestamp FROM auth_log "
+            "WHERE timestamp >= ? ORDER BY timestamp",
+            (since.isoformat(),)
+        ).fetchall()
+        for r in rows:
+            ts = datetime.fromisoformat(r["timestamp"]).replace(tzinfo=timezone.utc).timestamp()
+            self.record(r["username"], r["ip_address"], bool(r["success"]), ts)
+        return len(rows)
+
+    def stats(self) -> dict:
+        return {
+            "usernames": len(self.users),
+            "ips": len(self.ips),
+            "evictions": self.users.evictions + self.ips.evictions,
+            "rejected": self.rejected,
+        }
+
+
+tracker = LockoutTracker(LOCKOUT_WINDOW, LOCKOUT_USER_FAILURES, LOCKOUT_IP_FAILURES, LOCKOUT_MAX_KEYS)
@@ -0,0 +1,166 @@
+"""
+Retention for auth_log and admin_log.
+
+Run daily by the scheduler (see main.py), or by hand:
+
+    python log_retention.py
+
+1. Rollup: new auth_log rows are folded into auth_log_daily (attempts and
+   failures per day, username and IP), tracked by an id watermark so every
+   row is counted exactly once, also after it has been pruned.
+2. Archive and prune: rows older than the table's retention age, or beyond
+   its row cap, are appended to a gzip-compressed JSONL file in
+   LOG_ARCHIVE_DIR (one file per table and day; "" disables archiving) and
+   then deleted.
+
+Everything runs in batches of RETENTION_BATCH_SIZE rows, each in its own
+short transaction, so logins and admin actions never wait long for the
+write lock. An archive batch is written before its delete commits, so a
+crash in between can at worst archive a few rows twice.
+"""
+import gzip
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+from config import (
+    LOCAL_ZONE,
+    AUTH_LOG_RETENTION_DAYS,
+    AUTH_LOG_MAX_ROWS,
+    ADMIN_LOG_RETENTION_DAYS,
+    ADMIN_LOG_MAX_ROWS,
+    LOG_ARCHIVE_DIR,
+    RETENTION_BATCH_SIZE,
+)
+
+_ROLLUP_WATERMARK = "auth_log_rollup_id"
+
+_ROLLUP = """
+INSERT INTO auth_log_daily (day, username, ip_address, attempts, failures)
+SELECT substr(timestamp, 1, 10), username, ip_address,
+       COUNT(*), SUM(CASE WHEN success THEN 0 ELSE 1 END)
+  FROM auth_log
+ WHERE id > ? AND id <= ?
+ GROUP BY 1, 2, 3
+ON CONFLICT(day, username, ip_address) DO UPDATE SET
+    attempts = attempts + excluded.attempts,
+    failures = failures + excluded.failures
+"""
+
+
+def _auth_cutoff(days: int) -> str:
+    # auth_log stores datetime.utcnow().isoformat()
+    return (datetime.now(tz=timezone.utc) - timedelta(days=days)).replace(tzinfo=None).isoformat()
+
+
+def _admin_cutoff(days: int) -> str:
+    # admin_log stores "%Y-%m-%d %H:%M:%S" in LOCAL_ZONE
+    return (datetime.now(tz=LOCAL_ZONE) - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+# table -> (max age in days, row cap, cutoff formatter); 0 disables a limit
+POLICIES = {
+    "auth_log": (AUTH_LOG_RETENTION_DAYS, AUTH_LOG_MAX_ROWS, _auth_cutoff),
+    "admin_log": (ADMIN_LOG_RETENTION_DAYS, ADMIN_LOG_MAX_ROWS, _admin_cutoff),
+}
+
+
+def rollup_auth_log(db, batch_size: int = RETENTION_BATCH_SIZE) -> int:
+    """Fold auth_log rows past the watermark into auth_log_daily; returns rows rolled up."""
+    total = 0
+    while True:
+        db.execute("BEGIN IMMEDIATE")
+        row = db.execute(
+            "SELECT value FROM maintenance_state WHERE key = ?", (_ROLLUP_WATERMARK,)
+        ).fetchone()
+        start = row["value"] if row else 0
+        end = db.execute(
+            "SELECT MAX(id) FROM (SELECT id FROM auth_log WHERE id > ? ORDER BY id LIMIT ?)",
+            (start, batch_size)
+        ).fetchone()[0]
+        if end is None:
+            db.commit()
+            return total
+        db.execute(_ROLLUP, (start, end))
+        db.execute(
+            "INSERT INTO maintenance_state (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (_ROLLUP_WATERMARK, end)
+        )
+        total += db.execute(
+            "SELECT COUNT(*) FROM auth_log WHERE id > ? AND id <= ?", (start, end)
+        ).fetchone()[0]
+        db.commit()
+
+
+def _archive(table: str, rows):
+    if not LOG_ARCHIVE_DIR or not rows:
+        return
+    os.makedirs(LOG_ARCHIVE_DIR, exist_ok=True)
+    day = datetime.now(tz=LOCAL_ZONE).strftime("%Y-%m-%d")
+    path = os.path.join(LOG_ARCHIVE_DIR, f"{table}-{day}.jsonl.gz")
+    # each append is a new gzip member; gzip/zcat read them as one stream
+    with gzip.open(path, "at", encoding="utf-8") as f:
+        for r in rows:
+            f.write(json.dumps(dict(r), ensure_ascii=False) + "\n")
+
+
+def _prune_where(db, table: str, condition: str, args, batch_size: int) -> int:
+    """Archive and delete rows matching `condition`, oldest id first, in batches."""
+    deleted = 0
+    while True:
+        db.execute("BEGIN IMMEDIATE")
+        rows = db.execute(
+            f"SELECT * FROM {table} WHERE {condition} ORDER BY id LIMIT ?",
+            (*args, batch_size)
+        ).fetchall()
+        if not rows:
+            db.commit()
+            return deleted
+        _archive(table, rows)
+        # exactly the selected rows: every match up to the last id we read
+        deleted += db.execute(
+            f"DELETE FROM {table} WHERE id <= ? AND {condition}",
+            (rows[-1]["id"], *args)
+        ).rowcount
+        db.commit()
+
+
+def prune_table(db, table: str, batch_size: int = RETENTION_BATCH_SIZE) -> int:
+    """Apply the table's age and row-cap policy; returns rows removed."""
+    days, max_rows, cutoff = POLICIES[table]
+    deleted = 0
+    if days > 0:
+        deleted += _prune_where(db, table, "timestamp < ?", (cutoff(days),), batch_size)
+    if max_rows > 0:
+        # everything at or below this id is beyond the cap
+        row = db.execute(
+            f"SELECT id FROM {table} ORDER BY id DESC LIMIT 1 OFFSET ?", (max_rows,)
+        ).fetchone()
+        if row:
+            deleted += _prune_where(db, table, "id <= ?", (row["id"],), batch_size)
+    return deleted
+
+
+def run(db) -> str:
+    """Scheduler job: roll up, then archive and prune both tables."""
+    rolled = rollup_auth_log(db)
+    pruned = {table: prune_table(db, table) for table in POLICIES}
+    if not rolled and not any(pruned.values()):
+        return ""
+    return f"rolled up {rolled} auth_log rows; pruned " + ", ".join(
+        f"{n} {table}" for table, n in pruned.items()
+    )
+
+
+def main():
+    import db as database
+    database.init_db()
+    with database.get_db() as conn:
+        print(f"[retention] {run(conn) or 'nothing to do'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
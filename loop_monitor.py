@@ -0,0 +1,59 @@
+"""
+Event-loop lag monitor.
+
+A background task asks to wake up every LOOP_LAG_INTERVAL seconds and
+records how late it actually woke. Anything that blocks the loop, such as
+synchronous disk I/O or CPU work in an async handler, shows up directly as
+lag. Stats are per worker process; see GET /admin/loop-lag.
+"""
+import asyncio
+
+from config import LOOP_LAG_INTERVAL, LOOP_LAG_WARN
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float, warn_after: float):
+        self.interval = interval
+        self.warn_after = warn_after
+        self.samples = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+        self.slow = 0
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            self.samples += 1
+            self.total_lag += lag
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.warn_after:
+                self.slow += 1
+                print(f"[loop] Event loop blocked for {lag * 1000:.0f} ms")
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "interval_ms": round(self.interval * 1000, 1),
+            "samples": self.samples,
+            "last_ms": round(self.last_lag * 1000, 2),
+            "avg_ms": round(self.total_lag / self.samples * 1000, 2) if self.samples else 0.0,
+            "max_ms": round(self.max_lag * 1000, 2),
+            "slow": self.slow,
+        }
+
+
+monitor = LoopLagMonitor(LOOP_LAG_INTERVAL, LOOP_LAG_WARN)
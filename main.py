@@ -4,25 +4,21 @@ from pathlib import Path
 from fastapi import FastAPI, Request, Depends
 from fastapi.responses import RedirectResponse, HTMLResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 from starlette.middleware.sessions import SessionMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
 from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware
-from passlib.context import CryptContext
 
 # Initialize database
 db.init_db()
 
 # Password hasher for bootstrap
-pwd = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from passwords import pwd
 
 app = FastAPI()
 import db
 db.init_db()
 
 # Password hasher for bootstrap
-pwd = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from passwords import pwd
 
 app = FastAPI()
 # Mount static files (absolute path)
@@ -33,9 +29,7 @@ app.mount(
     name="static"
 )
 
-# Rate limiter
-from rate_limit import limiter
-app.state.limiter = limiter
+# Rate limits are route dependencies (see rate_limit.py)
 @app.exception_handler(RateLimitExceeded)
 def rate_limit_handler(request: Request, exc: RateLimitExceeded):
     return JSONResponse(status_code=429, content={"error": "Too many requests."})
@@ -50,55 +44,85 @@ def bootstrap_admin():
             "SELECT 1 FROM players WHERE username = ?", (username,)
         ).fetchone()
         if not exists:
-            # Create account requiring password set on first login
-            conn.execute(
-                "INSERT INTO players (username, password, is_admin, must_set_password) VALUES (?, ?, 1, 1)",
+            # Create account requiring password set on first login.
+            # OR IGNORE: with several workers starting at once, one of them wins.
+            created = conn.execute(
+                "INSERT OR IGNORE INTO players (username, password, is_admin, must_set_password) VALUES (?, ?, 1, 1)",
                 (username, "")
-            )
+            ).rowcount
             conn.commit()
-            print(f"[startup] Bootstrapped admin account '{username}', requires password set.")
-
-# Middleware
-class InitialPasswordMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        if (
-            request.session.get("user") and
-            request.session.get("must_set_password") and
-            not request.url.path.startswith(("/login", "/set-password", "/static", "/logout"))
-        ):
-            return RedirectResponse("/set-password", 302)
-        return await call_next(request)
-
-class NoCacheMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        protected = ["/dashboard","/profile","/leaderboard","/player/","/monthly-stats","/global-stats","/history","/admin"]
-        if any(request.url.path.startswith(p) for p in protected):
-            response.headers.update({
-                "Cache-Control": "no-store, no-cache, must-revalidate, proxy-revalidate",
-                "Pragma": "no-cache",
-                "Expires": "0",
-                "Surrogate-Control": "no-store"
-            })
-        return response
-
-# Register middleware
-app.add_middleware(InitialPasswordMiddleware)
+            if created:
+                print(f"[startup] Bootstrapped admin account '{username}', requires password set.")
+
+# Event-loop lag monitor (see loop_monitor.py)
+from loop_monitor import monitor as loop_monitor
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    loop_monitor.start()
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    loop_monitor.stop()
+
+# Login lockout state comes from the recent auth_log (see lockout.py)
+import lockout
+
+@app.on_event("startup")
+def rebuild_lockout():
+    with db.get_db() as conn:
+        lockout.tracker.rebuild(conn)
+
+# Buffered auth_log/admin_log writer (see audit.py); stopping it flushes the queue
+import audit
+
+@app.on_event("startup")
+def start_audit_writer():
+    audit.writer.start()
+
+@app.on_event("shutdown")
+def stop_audit_writer():
+    audit.writer.stop()
+
+# Background jobs (see scheduler.py)
+import potm
+from scheduler import scheduler
+import log_retention
+scheduler.every(config.POTM_FINALIZE_INTERVAL, potm.finalize_months, "potm")
+scheduler.every(config.RETENTION_INTERVAL, log_retention.run, "log retention")
+
+@app.on_event("startup")
+async def start_scheduler():
+    scheduler.start()
+
+@app.on_event("shutdown")
+async def stop_scheduler():
+    scheduler.stop()
+
+# Register middleware (the last one added runs first)
+# AppMiddleware needs the session, so it goes inside SessionMiddleware.
+# Rate limits are route dependencies (see rate_limit.py); with no default
+# limits the SlowAPIMiddleware layer had nothing to do and is not installed.
+from middleware import AppMiddleware
+import security
+app.add_middleware(AppMiddleware)
 app.add_middleware(
     SessionMiddleware,
-    secret_key=config.SESSION_SECRET,
+    secret_key=security.session_secret(),
     https_only=False,
     same_site="strict",
     session_cookie="session",
     max_age=14 * 24 * 3600
 )
-app.add_middleware(SlowAPIMiddleware)
-app.add_middleware(NoCacheMiddleware)
-from security import SecurityHeadersMiddleware
-app.add_middleware(SecurityHeadersMiddleware)
 
-# Templates
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+# Templates: one shared environment (see templating.py)
+import templating
+from templating import templates
+
+@app.on_event("startup")
+def precompile_templates():
+    if config.TEMPLATE_PRECOMPILE:
+        print(f"[startup] Precompiled {templating.precompile()} templates.")
 
 # Include routers
 import routers.auth as auth
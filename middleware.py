@@ -0,0 +1,71 @@
+"""
+The app's own request/response handling, as one pure ASGI middleware.
+
+It replaces three BaseHTTPMiddleware layers (initial-password redirect,
+no-cache headers, security headers). Those each ran the endpoint in a
+separate task and re-streamed the body; this one only looks at the scope
+and edits the headers of the `http.response.start` message, so the body
+passes straight through. It must sit inside SessionMiddleware, which puts
+the decoded session on scope["session"].
+"""
+from starlette.datastructures import MutableHeaders
+from starlette.responses import RedirectResponse
+
+from security import SECURITY_HEADERS
+
+# Pages with per-user data; without a validator they must never be stored
+NO_STORE_PREFIXES = ("/dashboard", "/profile", "/leaderboard", "/player/", "/monthly-stats",
+                     "/global-stats", "/history", "/admin")
+
+NO_STORE_HEADERS = {
+    "Cache-Control": "no-store, no-cache, must-revalidate, proxy-revalidate",
+    "Pragma": "no-cache",
+    "Expires": "0",
+    "Surrogate-Control": "no-store",
+}
+
+# Data pages with an ETag (see etags.py): the browser may keep its own copy
+# but must revalidate it; shared caches never store it
+REVALIDATE_HEADERS = {
+    "Cache-Control": "private, no-cache",
+    "Vary": "Cookie",
+}
+
+# Reachable while a password change is still required
+SET_PASSWORD_EXEMPT = ("/login", "/set-password", "/static", "/logout")
+
+
+class AppMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        is_static = path.startswith("/static")
+        no_store = path.startswith(NO_STORE_PREFIXES)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if "etag" in headers and not is_static:
+                    headers.update(REVALIDATE_HEADERS)
+                elif no_store:
+                    headers.update(NO_STORE_HEADERS)
+                headers.update(SECURITY_HEADERS)
+            await send(message)
+
+        session = scope.get("session") or {}
+        if (
+            session.get("user") and
+            session.get("must_set_password") and
+            not path.startswith(SET_PASSWORD_EXEMPT)
+        ):
+            response = RedirectResponse("/set-password", 302)
+            await response(scope, receive, send_with_headers)
+            return
+
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,57 @@
+"""
+Rendered-context cache for the shared, read-heavy pages.
+
+/stats, /global-stats, /monthly-stats, /leaderboard and /history show the
+same data to every logged-in user. Each route builds its template context
+through `cached_context`, keyed by route, the normalised query parameters
+and the global data version (see versions.py). Every write that changes
+what these pages show bumps that version, so a cached context is reused
+until the next write; PAGE_CACHE_TTL is only a fallback. Request-specific
+values (the request itself, CSRF tokens) are added by the caller and never
+cached.
+"""
+import threading
+from collections import defaultdict
+
+import versions
+from cache import TTLCache
+from config import PAGE_CACHE_SIZE, PAGE_CACHE_TTL
+
+# (route, params, version) -> context dict
+_cache = TTLCache(maxsize=PAGE_CACHE_SIZE, ttl=PAGE_CACHE_TTL)
+
+# route -> [hits, misses]
+_counts = defaultdict(lambda: [0, 0])
+_counts_lock = threading.Lock()
+
+
+def cached_context(db, route: str, params: tuple, build, version: int = None):
+    """
+    Return build(db) for this route and params, reusing it until the data
+    changes. Pass `version` if the caller already read the global version.
+    """
+    if version is None:
+        version = versions.current(db, versions.GLOBAL)
+    key = (route, params, version)
+    ctx = _cache.get(key)
+    hit = ctx is not None
+    if not hit:
+        ctx = build(db)
+        _cache.set(key, ctx)
+    with _counts_lock:
+        _counts[route][0 if hit else 1] += 1
+    return ctx
+
+
+def stats() -> dict:
+    """Hit/miss counts per route, plus the overall cache stats."""
+    with _counts_lock:
+        routes = {
+            route: {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            }
+            for route, (hits, misses) in sorted(_counts.items())
+        }
+    return {"total": _cache.stats(), "routes": routes}
@@ -0,0 +1,33 @@
+"""
+Password hashing.
+
+bcrypt costs 100–300 ms of CPU per call. The async helpers run it on a small
+dedicated thread pool (bcrypt releases the GIL), so async handlers never block
+the event loop and at most HASH_WORKERS hashes run at once; extra calls queue.
+"""
+import asyncio
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+from config import HASH_WORKERS
+
+pwd = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+
+
+async def verify_password(password: str, hashed: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, pwd.verify, password, hashed)
+
+
+async def hash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, pwd.hash, password)
+
+
+def new_session_id() -> str:
+    """Random per-login session marker; no hashing needed."""
+    return secrets.token_urlsafe(32)
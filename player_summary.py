@@ -0,0 +1,90 @@
+"""
+Everything the dashboard and public profile show for one player.
+
+`player_summary` reads the player row, the all-time player_stats row and
+the last ten sessions in a single query, plus the precomputed balance
+series. Results are cached per player together with the player's data
+version (see versions.py); any write that touches the player bumps the
+version, so a cached summary is never served stale. The TTL only bounds
+memory for players nobody looks at.
+"""
+import json
+
+import aggregates
+import charts
+import stats_engine
+import versions
+from cache import TTLCache
+from config import CHART_DOWNSAMPLE, CHART_MAX_POINTS, SUMMARY_CACHE_SIZE, SUMMARY_CACHE_TTL
+
+# (username, version) -> summary; entries for old versions just age out
+_cache = TTLCache(maxsize=SUMMARY_CACHE_SIZE, ttl=SUMMARY_CACHE_TTL)
+
+_SUMMARY_SQL = """
+SELECT p.username,
+       p.avatar_path,
+       p.balance,
+       COALESCE(s.games_played, 0) AS games_played,
+       COALESCE(s.invested, 0)     AS invested,
+       COALESCE(s.rebuys, 0)       AS rebuys,
+       COALESCE(s.wins, 0)         AS wins,
+       s.best_session,
+       s.worst_session,
+       (SELECT json_group_array(json_object('date', r.date, 'net', r.net))
+          FROM (SELECT g.date, gp.net
+                  FROM game_players gp
+                  JOIN games g ON g.id = gp.game_id
+                 WHERE gp.username = p.username
+                 ORDER BY g.date DESC
+                 LIMIT 10) r) AS recent
+  FROM players p
+  LEFT JOIN player_stats s ON s.username = p.username AND s.period = ?
+ WHERE p.username = ?
+"""
+
+
+def _load(db, username: str):
+    row = db.execute(_SUMMARY_SQL, (aggregates.ALL_TIME, username)).fetchone()
+    if row is None:
+        return None
+
+    total_games = row["games_played"]
+    net_sum = row["balance"]
+    dates, cumulative = aggregates.load_series(db, username)
+    dates, cumulative = charts.downsample(dates, cumulative, CHART_DOWNSAMPLE, CHART_MAX_POINTS)
+    return {
+        "username": row["username"],
+        "avatar_path": row["avatar_path"],
+        "total_games": total_games,
+        "win_rate": round(row["wins"] / total_games * 100, 1) if total_games else 0,
+        "net_sum": net_sum,
+        "avg_profit": round(net_sum / total_games, 1) if total_games else 0,
+        "dates": dates,
+        "cumulative": cumulative,
+        "recent": json.loads(row["recent"]),
+        "roi": stats_engine.roi({"net": net_sum, "invested": row["invested"]}),
+        "total_buyin": row["invested"],
+        "biggest_win": row["best_session"],
+        "biggest_loss": row["worst_session"],
+        "total_rebuys": row["rebuys"],
+    }
+
+
+def player_summary(db, username: str, version: int = None):
+    """
+    Return the summary dict for `username`, or None if no such player.
+    Pass `version` if the caller already read the player's data version.
+    """
+    if version is None:
+        version = versions.current(db, versions.player_key(username))
+    key = (username, version)
+    summary = _cache.get(key)
+    if summary is None:
+        summary = _load(db, username)
+        if summary is not None:
+            _cache.set(key, summary)
+    return summary
+
+
+def cache_stats() -> dict:
+    return _cache.stats()
@@ -0,0 +1,55 @@
+"""
+Player of the Month finalization.
+
+`finalize_months` records the POTM of every completed month (in LOCAL_ZONE)
+that has games but no potm_history row yet, oldest first, so months missed
+while the app was down are backfilled on the next run. The unique index on
+potm_history.month plus INSERT OR IGNORE make it safe to run from several
+workers at once. Run by the scheduler (see main.py); page renders only read.
+"""
+from datetime import datetime
+
+import aggregates
+import avatars
+import stats_engine
+import versions
+from config import LOCAL_ZONE
+
+
+def pending_months(db, current_month: str):
+    """Completed months with games and no recorded POTM, oldest first."""
+    return [r["month"] for r in db.execute("""
+        SELECT DISTINCT g.month
+          FROM games g
+         WHERE g.month < ?
+           AND NOT EXISTS (SELECT 1 FROM potm_history h WHERE h.month = g.month)
+         ORDER BY g.month
+    """, (current_month,)).fetchall()]
+
+
+def finalize_months(db, now: datetime = None) -> str:
+    """Record every pending POTM; returns a short summary, or "" if nothing was due."""
+    current_month = (now or datetime.now(tz=LOCAL_ZONE)).strftime("%Y-%m")
+    months = pending_months(db, current_month)
+    if not months:
+        return ""
+
+    recorded = []
+    db.execute("BEGIN IMMEDIATE")
+    for month in months:
+        awards = stats_engine.compute_awards(aggregates.load_period(db, month), stats_engine.MONTH)
+        potm = awards["player_of_month"]
+        if potm == "N/A":
+            continue
+        avatar_of = avatars.load_avatars(db, [potm])
+        inserted = db.execute(
+            "INSERT OR IGNORE INTO potm_history (month, username, avatar_path) VALUES (?, ?, ?)",
+            (month, potm, avatar_of.get(potm))
+        ).rowcount
+        if inserted:
+            recorded.append(f"{month}={potm}")
+    if recorded:
+        # the all-time pages list POTM history
+        versions.bump(db, versions.GLOBAL)
+    db.commit()
+    return f"recorded {', '.join(recorded)}" if recorded else ""
@@ -1,5 +1,119 @@
 # rate_limit.py
+"""
+The one slowapi limiter used by every rate-limited route.
+
+Counters live in RATE_LIMIT_STORAGE. The default, "sqlite://", keeps them
+in the app database (table rate_limits), so a limit holds across all
+uvicorn workers; "memory://" is per process and only suitable for a
+single worker. Only slowapi's default fixed-window strategy is supported
+by the SQLite storage.
+
+Routes declare limits with `Depends(limit("5/minute", "login"))` rather
+than slowapi's @limiter.limit: the decorator checks synchronously inside
+async handlers, and a SQLite counter upsert can wait up to the busy
+timeout for the write lock, stalling the whole event loop. `limit` runs
+the check on the database thread pool instead.
+"""
+import itertools
+import time
+from sqlite3 import Error as SQLiteError
+
+from fastapi import Request
+from limits import parse
+from limits.storage import Storage
 from slowapi import Limiter
+from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
+from slowapi.wrappers import Limit
+
+from config import RATE_LIMIT_STORAGE
+from db import get_db, run_in_pool
+
+# Purge expired counters on every Nth hit
+_PURGE_EVERY = 500
+
+_INCR = """
+INSERT INTO rate_limits (key, count, expires_at) VALUES (:key, :amount, :expires_at)
+ON CONFLICT(key) DO UPDATE SET
+    count      = CASE WHEN expires_at <= :now THEN :amount ELSE count + :amount END,
+    expires_at = CASE WHEN expires_at <= :now OR :elastic THEN :expires_at ELSE expires_at END
+RETURNING count
+"""
+
+
+class SQLiteStorage(Storage):
+    """Fixed-window counters in the app database, shared by all workers."""
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: str = None, **options):
+        super().__init__(uri, **options)
+        self._hits = itertools.count(1)
+
+    @property
+    def base_exceptions(self):
+        return SQLiteError
+
+    def incr(self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1) -> int:
+        now = time.time()
+        with get_db() as db:
+            count = db.execute(_INCR, {
+                "key": key,
+                "amount": amount,
+                "expires_at": now + expiry,
+                "now": now,
+                "elastic": elastic_expiry,
+            }).fetchone()[0]
+            if next(self._hits) % _PURGE_EVERY == 0:
+                db.execute("DELETE FROM rate_limits WHERE expires_at <= ?", (now,))
+        return count
+
+    def get(self, key: str) -> int:
+        with get_db() as db:
+            row = db.execute(
+                "SELECT count FROM rate_limits WHERE key = ? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+        return row["count"] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        with get_db() as db:
+            row = db.execute(
+                "SELECT expires_at FROM rate_limits WHERE key = ?", (key,)
+            ).fetchone()
+        return row["expires_at"] if row else time.time()
+
+    def check(self) -> bool:
+        try:
+            with get_db() as db:
+                db.execute("SELECT 1 FROM rate_limits LIMIT 1")
+            return True
+        except SQLiteError:
+            return False
+
+    def reset(self) -> int:
+        with get_db() as db:
+            return db.execute("DELETE FROM rate_limits").rowcount
+
+    def clear(self, key: str) -> None:
+        with get_db() as db:
+            db.execute("DELETE FROM rate_limits WHERE key = ?", (key,))
+
+
+limiter = Limiter(key_func=get_remote_address, storage_uri=RATE_LIMIT_STORAGE)
+
+
+def limit(value: str, scope: str):
+    """
+    Dependency that counts the request against `value` (e.g. "5/minute")
+    per client IP, under its own `scope`, and raises RateLimitExceeded
+    once the limit is used up.
+    """
+    item = parse(value)
+    rule = Limit(item, get_remote_address, scope, False, None, None, None, 1, False)
+
+    async def check(request: Request):
+        if not await run_in_pool(limiter.limiter.hit, item, get_remote_address(request), scope):
+            raise RateLimitExceeded(rule)
 
-limiter = Limiter(key_func=get_remote_address)
+    return check
@@ -1,15 +1,23 @@
-from fastapi import APIRouter, Request, Form, Depends, HTTPException
-from fastapi.responses import RedirectResponse, HTMLResponse
-from fastapi.templating import Jinja2Templates
-from datetime import datetime
+from fastapi import APIRouter, Request, Form, Depends, HTTPException, UploadFile, File
+from fastapi.responses import RedirectResponse, HTMLResponse, JSONResponse, StreamingResponse
+import csv
+import io
 import sqlite3
 
-from deps import get_current_user, generate_csrf, verify_csrf
+from deps import get_current_user, generate_csrf, verify_csrf, invalidate_user, user_cache_stats
 from db import get_db
-from config import LOCAL_ZONE
+from templating import templates
+from config import IMPORT_BATCH_SIZE, EXPORT_BATCH_SIZE
+from ledger import DATE_PATTERN
+import audit
+import game_import
+import lockout
+from loop_monitor import monitor as loop_monitor
+import page_cache
+import player_summary
+import versions
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
 
 
 @router.get("/admin", response_class=HTMLResponse, dependencies=[Depends(generate_csrf)])
@@ -28,14 +36,14 @@ def admin_panel(request: Request, user=Depends(get_current_user)):
             SELECT actor, action, target, ip_address, 
                    strftime('%Y-%m-%d %H:%M', datetime(timestamp)) as timestamp
               FROM admin_log
-             ORDER BY timestamp DESC
+             ORDER BY admin_log.timestamp DESC
              LIMIT 50
         """).fetchall()
         auth_logs = db.execute("""
             SELECT username, success, ip_address, 
                    strftime('%Y-%m-%d %H:%M', datetime(timestamp)) as timestamp
               FROM auth_log
-             ORDER BY timestamp DESC
+             ORDER BY auth_log.timestamp DESC
              LIMIT 50
         """).fetchall()
 
@@ -49,15 +57,6 @@ def admin_panel(request: Request, user=Depends(get_current_user)):
     })
 
 
-def _log_action(conn, actor: str, action: str, target: str = None, ip: str = None):
-    ts = datetime.now(tz=LOCAL_ZONE).strftime("%Y-%m-%d %H:%M:%S")
-    conn.execute(
-        "INSERT INTO admin_log (actor, action, target, ip_address, timestamp) VALUES (?, ?, ?, ?, ?)",
-        (actor, action, target, ip, ts)
-    )
-    conn.commit()
-
-
 @router.post("/toggle-admin", dependencies=[Depends(verify_csrf)])
 def toggle_admin(
     request: Request,
@@ -79,11 +78,12 @@ def toggle_admin(
                 "UPDATE players SET is_admin = ? WHERE username = ?",
                 (new_status, username)
             )
-            _log_action(conn,
-                        actor=user["username"],
+    if target:
+        audit.log_admin(actor=user["username"],
                         action=f"toggle_admin={new_status}",
                         target=username,
                         ip=request.client.host)
+    invalidate_user(username)
     return RedirectResponse("/admin", status_code=302)
 
 
@@ -102,11 +102,12 @@ def delete_user(
             "DELETE FROM players WHERE username = ?",
             (username,)
         )
-        _log_action(conn,
-                    actor=user["username"],
+        versions.bump_players(conn, username)
+    audit.log_admin(actor=user["username"],
                     action="delete_user",
                     target=username,
                     ip=request.client.host)
+    invalidate_user(username)
     return RedirectResponse("/admin", status_code=302)
 
 
@@ -128,11 +129,8 @@ def create_user(
                 "VALUES (?, ?, ?, 1, 0)",
                 (username, "", is_admin)
             )
-            _log_action(conn,
-                        actor=user["username"],
-                        action="create_user",
-                        target=username,
-                        ip=request.client.host)
+            versions.bump_players(conn, username)
+            conn.commit()
             msg = f"User '{username}' created."
         except sqlite3.IntegrityError:
             error = "Username already exists"
@@ -143,6 +141,11 @@ def create_user(
         all_players = conn.execute(
             "SELECT username FROM players ORDER BY username"
         ).fetchall()
+    if msg:
+        audit.log_admin(actor=user["username"],
+                        action="create_user",
+                        target=username,
+                        ip=request.client.host)
 
     return templates.TemplateResponse("admin.html", {
         "request": request,
@@ -167,11 +170,11 @@ def reset_password(
             "UPDATE players SET must_set_password = 1, password = '' WHERE username = ?",
             (username,)
         )
-        _log_action(conn,
-                    actor=user["username"],
+    audit.log_admin(actor=user["username"],
                     action="reset_password",
                     target=username,
                     ip=request.client.host)
+    invalidate_user(username)
     return RedirectResponse("/admin", status_code=302)
 
 
@@ -189,9 +192,134 @@ def set_balance(
             "UPDATE players SET balance = ? WHERE username = ?",
             (balance, username)
         )
-        _log_action(conn,
-                    actor=user["username"],
+        versions.bump_players(conn, username)
+    audit.log_admin(actor=user["username"],
                     action=f"set_balance={balance}",
                     target=username,
                     ip=request.client.host)
-    return RedirectResponse("/admin", status_code=302)
\ No newline at end of file
+    invalidate_user(username)
+    return RedirectResponse("/admin", status_code=302)
+
+
+@router.post("/admin/import", dependencies=[Depends(verify_csrf)])
+def import_games(
+    request: Request,
+    file: UploadFile = File(...),
+    batch_size: int = Form(IMPORT_BATCH_SIZE),
+    user=Depends(get_current_user)
+):
+    if not user or user["is_admin"] != 1:
+        raise HTTPException(status_code=403)
+    try:
+        fmt = game_import.detect_format(file.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    with get_db() as conn:
+        report = game_import.import_games(conn, stream, fmt, batch_size)
+    audit.log_admin(actor=user["username"],
+                    action=f"import_games={report['imported']}",
+                    target=file.filename,
+                    ip=request.client.host)
+    invalidate_user(*report["players"])
+    return JSONResponse(report, status_code=500 if report["aborted"] else 200)
+
+
+@router.get("/admin/cache-stats")
+def cache_stats(user=Depends(get_current_user)):
+    """Per-worker cache sizes and hit rates, for monitoring."""
+    if not user or user["is_admin"] != 1:
+        raise HTTPException(status_code=403)
+    return JSONResponse({
+        "users": user_cache_stats(),
+        "player_summary": player_summary.cache_stats(),
+        "pages": page_cache.stats(),
+        "lockout": lockout.tracker.stats(),
+    })
+
+
+@router.get("/admin/loop-lag")
+def loop_lag(user=Depends(get_current_user)):
+    """How late this worker's event loop wakes up, for spotting blocking calls."""
+    if not user or user["is_admin"] != 1:
+        raise HTTPException(status_code=403)
+    return JSONResponse({**loop_monitor.stats(), "audit": audit.writer.stats()})
+
+
+# ── CSV export ───────────────────────────────────────────────────────────
+EXPORTS = {
+    "games": (
+        ["id", "date", "winner", "amount", "rebuys", "buyin"],
+        "SELECT g.id, g.date, g.winner, g.amount, g.rebuys, g.buyin FROM games g",
+        "EXISTS (SELECT 1 FROM game_players gp WHERE gp.game_id = g.id AND gp.username = ?)",
+        "ORDER BY g.date, g.id",
+    ),
+    "game_players": (
+        ["game_id", "date", "username", "buyin", "rebuys", "cashout", "net"],
+        "SELECT gp.game_id, g.date, gp.username, gp.buyin, gp.rebuys, gp.cashout, gp.net "
+        "FROM game_players gp JOIN games g ON g.id = gp.game_id",
+        "gp.username = ?",
+        "ORDER BY g.date, gp.game_id, gp.id",
+    ),
+}
+
+
+def _export_rows(table: str, date_from: str, date_to: str, player: str):
+    """Yield CSV text one fetchmany() batch at a time, so memory stays flat."""
+    header, select, player_clause, order_by = EXPORTS[table]
+    where, args = [], []
+    if date_from:
+        where.append("g.date >= ?")
+        args.append(date_from)
+    if date_to:
+        where.append("g.date <= ?")
+        args.append(date_to)
+    if player:
+        where.append(player_clause)
+        args.append(player)
+    sql = select
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " " + order_by
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    with get_db() as conn:
+        cur = conn.execute(sql, args)
+        while True:
+            rows = cur.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            writer.writerows(rows)
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+@router.get("/admin/export/{table}.csv")
+def export_csv(
+    request: Request,
+    table: str,
+    user=Depends(get_current_user)
+):
+    if not user or user["is_admin"] != 1:
+        raise HTTPException(status_code=403)
+    if table not in EXPORTS:
+        raise HTTPException(status_code=404)
+    params = request.query_params
+    date_from = params.get("date_from", "").strip()
+    date_to = params.get("date_to", "").strip()
+    player = params.get("player", "").strip()
+    for value in (date_from, date_to):
+        if value and not DATE_PATTERN.match(value):
+            raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD.")
+
+    return StreamingResponse(
+        _export_rows(table, date_from, date_to, player),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{table}.csv"'},
+    )
@@ -1,16 +1,17 @@
 from fastapi import APIRouter, Request, Form, HTTPException, Depends
 from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
-from passlib.context import CryptContext
-from db import get_db
-from deps import get_current_user, generate_csrf, verify_csrf
-from rate_limit import limiter
+from db import run_db
+from templating import templates
+from deps import get_current_user, generate_csrf, verify_csrf, invalidate_user
+from passwords import verify_password, hash_password, new_session_id
+from rate_limit import limit
+import audit
+from lockout import tracker as lockout
+import math
 import re
 from datetime import datetime
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
-pwd = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # Constants for security
 MIN_PASSWORD_LENGTH = 8
@@ -45,12 +46,27 @@ def validate_password(password: str) -> str:
         )
     return password
 
-def log_auth_attempt(db, username: str, success: bool, ip: str):
-    """Logger autentiseringsforsøk for sikkerhet"""
+async def log_auth_attempt(username: str, success: bool, ip: str):
+    """Logger autentiseringsforsøk for sikkerhet (buffered, see audit.py)"""
+    lockout.record(username, ip, success)
+    await audit.writer.submit_async(
+        "auth_log", (username, success, ip, datetime.utcnow().isoformat())
+    )
+
+def find_player(db, username: str):
+    return db.execute(
+        "SELECT * FROM players WHERE username = ?",
+        (username,)
+    ).fetchone()
+
+def store_password(db, username: str, hashed: str):
     db.execute(
-        """INSERT INTO auth_log (username, success, ip_address, timestamp)
-           VALUES (?, ?, ?, ?)""",
-        (username, success, ip, datetime.utcnow().isoformat())
+        """UPDATE players
+           SET password = ?, 
+               must_set_password = 0,
+               password_changed_at = ?
+           WHERE username = ?""",
+        (hashed, datetime.utcnow().isoformat(), username)
     )
     db.commit()
 
@@ -63,8 +79,7 @@ async def login_form(request: Request):
         {"request": request, "error": None, "csrf_token": request.session.get("csrf_token")}
     )
 
-@router.post("/login", dependencies=[Depends(verify_csrf)])
-@limiter.limit("5/minute")
+@router.post("/login", dependencies=[Depends(verify_csrf), Depends(limit("5/minute", "login"))])
 async def login(
     request: Request,
     username: str = Form(...),
@@ -78,37 +93,42 @@ async def login(
             "login.html",
             {"request": request, "error": e.detail, "csrf_token": request.session.get("csrf_token")}
         )
-    with get_db() as db:
-        user = db.execute(
-            "SELECT * FROM players WHERE username = ?",
-            (username,)
-        ).fetchone()
-        success = False
-        if user:
-            if user["must_set_password"]:
-                request.session["user"] = username
-                request.session["is_admin"] = user["is_admin"]
-                request.session["must_set_password"] = True
-                success = True
-                log_auth_attempt(db, username, success, request.client.host)
-                return RedirectResponse("/set-password", 302)
-            if pwd.verify(password, user["password"]):
-                success = True
-                request.session["user"] = username
-                request.session["is_admin"] = user["is_admin"]
-                request.session.pop("must_set_password", None)
-                request.session["_session_id"] = pwd.hash(username + str(datetime.utcnow()))
-                log_auth_attempt(db, username, success, request.client.host)
-                return RedirectResponse("/dashboard", 302)
-        log_auth_attempt(db, username, success, request.client.host)
+    # Checked before the player lookup and bcrypt, so locked-out guesses cost nothing
+    retry_after = lockout.retry_after(username, request.client.host)
+    if retry_after:
+        minutes = math.ceil(retry_after / 60)
         return templates.TemplateResponse(
             "login.html",
-            {"request": request, "error": "Invalid username or password", "csrf_token": request.session.get("csrf_token")}
+            {"request": request, "error": f"Too many failed attempts. Try again in {minutes} minute{'s' if minutes != 1 else ''}.", "csrf_token": request.session.get("csrf_token")},
+            status_code=429,
+            headers={"Retry-After": str(math.ceil(retry_after))}
         )
+    user = await run_db(find_player, username)
+    success = False
+    if user:
+        if user["must_set_password"]:
+            request.session["user"] = username
+            request.session["is_admin"] = user["is_admin"]
+            request.session["must_set_password"] = True
+            success = True
+            await log_auth_attempt(username, success, request.client.host)
+            return RedirectResponse("/set-password", 302)
+        if await verify_password(password, user["password"]):
+            success = True
+            request.session["user"] = username
+            request.session["is_admin"] = user["is_admin"]
+            request.session.pop("must_set_password", None)
+            request.session["_session_id"] = new_session_id()
+            await log_auth_attempt(username, success, request.client.host)
+            return RedirectResponse("/dashboard", 302)
+    await log_auth_attempt(username, success, request.client.host)
+    return templates.TemplateResponse(
+        "login.html",
+        {"request": request, "error": "Invalid username or password", "csrf_token": request.session.get("csrf_token")}
+    )
 
 @router.get("/set-password", dependencies=[Depends(generate_csrf)])
-async def set_pw_form(request: Request):
-    user = get_current_user(request)
+async def set_pw_form(request: Request, user=Depends(get_current_user)):
     if not user or not request.session.get("must_set_password"):
         return RedirectResponse("/login", 302)
     return templates.TemplateResponse(
@@ -120,9 +140,9 @@ async def set_pw_form(request: Request):
 async def set_password(
     request: Request,
     new_password: str = Form(...),
-    confirm: str = Form(...)
+    confirm: str = Form(...),
+    user=Depends(get_current_user)
 ):
-    user = get_current_user(request)
     if not user or not request.session.get("must_set_password"):
         return RedirectResponse("/login", 302)
     try:
@@ -137,19 +157,11 @@ async def set_password(
             "set_password.html",
             {"request": request, "error": "Passwords do not match", "csrf_token": request.session.get("csrf_token")}
         )
-    hashed = pwd.hash(new_password)
-    with get_db() as db:
-        db.execute(
-            """UPDATE players
-               SET password = ?, 
-                   must_set_password = 0,
-                   password_changed_at = ?
-               WHERE username = ?""",
-            (hashed, datetime.utcnow().isoformat(), user["username"])
-        )
-        db.commit()
+    hashed = await hash_password(new_password)
+    await run_db(store_password, user["username"], hashed)
+    invalidate_user(user["username"])
     request.session.pop("must_set_password", None)
-    request.session["_session_id"] = pwd.hash(user["username"] + str(datetime.utcnow()))
+    request.session["_session_id"] = new_session_id()
     return RedirectResponse("/dashboard", 302)
 
 @router.get("/register", dependencies=[Depends(generate_csrf)])
@@ -159,8 +171,7 @@ async def register_form(request: Request):
         {"request": request, "error": None, "csrf_token": request.session.get("csrf_token")}
     )
 
-@router.post("/register", dependencies=[Depends(verify_csrf)])
-@limiter.limit("5/minute")
+@router.post("/register", dependencies=[Depends(verify_csrf), Depends(limit("5/minute", "register"))])
 async def register_username(
     request: Request,
     username: str = Form(...)
@@ -172,25 +183,21 @@ async def register_username(
             "register.html",
             {"request": request, "error": e.detail, "csrf_token": request.session.get("csrf_token")}
         )
-    with get_db() as db:
-        user = db.execute(
-            "SELECT * FROM players WHERE username = ?",
-            (username,)
-        ).fetchone()
-        if not user:
-            return templates.TemplateResponse(
-                "register.html",
-                {"request": request, "error": "This account has not yet been created. Please contact the admin.", "csrf_token": request.session.get("csrf_token")}
-            )
-        if not user["must_set_password"]:
-            return templates.TemplateResponse(
-                "register.html",
-                {"request": request, "error": "This account has already been registered. Please log in instead.", "csrf_token": request.session.get("csrf_token")}
-            )
-        request.session["user"] = username
-        request.session["is_admin"] = user["is_admin"]
-        request.session["must_set_password"] = True
-        log_auth_attempt(db, username, True, request.client.host)
+    user = await run_db(find_player, username)
+    if not user:
+        return templates.TemplateResponse(
+            "register.html",
+            {"request": request, "error": "This account has not yet been created. Please contact the admin.", "csrf_token": request.session.get("csrf_token")}
+        )
+    if not user["must_set_password"]:
+        return templates.TemplateResponse(
+            "register.html",
+            {"request": request, "error": "This account has already been registered. Please log in instead.", "csrf_token": request.session.get("csrf_token")}
+        )
+    request.session["user"] = username
+    request.session["is_admin"] = user["is_admin"]
+    request.session["must_set_password"] = True
+    await log_auth_attempt(username, True, request.client.host)
     return RedirectResponse("/set-password", status_code=302)
 
 @router.get("/logout")
@@ -1,14 +1,108 @@
 # routers/history.py
 from fastapi import APIRouter, Request, Depends, Form, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from sqlite3 import DatabaseError
 
-from deps import get_current_user, generate_csrf, verify_csrf
+import aggregates
+import audit
+import etags
+import page_cache
+import versions
+from config import HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE
+from deps import get_current_user, generate_csrf, verify_csrf, invalidate_user
 from db import get_db
+from templating import templates
+from ledger import DATE_PATTERN
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
+
+
+def _parse_filters(request: Request) -> dict:
+    """Read and validate the history filters from the query string."""
+    params = request.query_params
+    filters = {
+        "winner":    params.get("winner", "").strip(),
+        "player":    params.get("player", "").strip(),
+        "date_from": params.get("date_from", "").strip(),
+        "date_to":   params.get("date_to", "").strip(),
+    }
+    for key in ("date_from", "date_to"):
+        if filters[key] and not DATE_PATTERN.match(filters[key]):
+            raise HTTPException(400, "Invalid date format. Use YYYY-MM-DD.")
+    return filters
+
+
+# Largest value SQLite can bind as an INTEGER
+_MAX_ID = 2 ** 63 - 1
+
+
+def _parse_cursor(cursor: str):
+    """A cursor is '<date>:<id>' of the last game on the previous page."""
+    if not cursor:
+        return None
+    date, _, game_id = cursor.partition(":")
+    # isdigit() alone also accepts digits like '²' that int() rejects
+    if not DATE_PATTERN.match(date) or not game_id.isascii() or not game_id.isdigit():
+        raise HTTPException(400, "Invalid cursor")
+    if int(game_id) > _MAX_ID:
+        raise HTTPException(400, "Invalid cursor")
+    return date, int(game_id)
+
+
+def _page_size(request: Request) -> int:
+    limit = request.query_params.get("limit", "")
+    if not limit:
+        return HISTORY_PAGE_SIZE
+    if not limit.isascii() or not limit.isdigit() or int(limit) <= 0:
+        raise HTTPException(400, "Invalid page size")
+    return min(int(limit), HISTORY_MAX_PAGE_SIZE)
+
+
+def fetch_history_page(db, filters: dict, cursor, limit: int):
+    """
+    Keyset pagination over games ordered by (date, id) descending, so each
+    page costs the same no matter how deep into the history it is.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    where, args = [], []
+    if filters["winner"]:
+        where.append("g.winner = ?")
+        args.append(filters["winner"])
+    if filters["date_from"]:
+        where.append("g.date >= ?")
+        args.append(filters["date_from"])
+    if filters["date_to"]:
+        where.append("g.date <= ?")
+        args.append(filters["date_to"])
+    if filters["player"]:
+        where.append(
+            "EXISTS (SELECT 1 FROM game_players gp WHERE gp.game_id = g.id AND gp.username = ?)"
+        )
+        args.append(filters["player"])
+    if cursor:
+        where.append("(g.date, g.id) < (?, ?)")
+        args.extend(cursor)
+
+    sql = "SELECT g.id, g.date, g.winner, g.amount FROM games g"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    # fetch one extra row to know whether another page exists
+    sql += " ORDER BY g.date DESC, g.id DESC LIMIT ?"
+    rows = db.execute(sql, (*args, limit + 1)).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f"{rows[-1]['date']}:{rows[-1]['id']}"
+    return rows, next_cursor
+
+
+def _cached_page(db, filters: dict, cursor, limit: int, version: int):
+    """fetch_history_page through the shared page cache (HTML and JSON share entries)."""
+    return page_cache.cached_context(
+        db, "history", (tuple(filters.items()), cursor, limit),
+        lambda db: fetch_history_page(db, filters, cursor, limit), version,
+    )
 
 
 @router.get(
@@ -20,22 +114,63 @@ templates = Jinja2Templates(directory="templates")
 def history(request: Request, current_user=Depends(get_current_user)):
     if not current_user:
         return RedirectResponse("/login", status_code=302)
+    filters = _parse_filters(request)
+    cursor = _parse_cursor(request.query_params.get("cursor", ""))
+    limit = _page_size(request)
     try:
         with get_db() as db:
-            games = db.execute(
-                "SELECT id, date, winner, amount FROM games ORDER BY date DESC"
-            ).fetchall()
+            version = versions.current(db, versions.GLOBAL)
+            etag = etags.page_etag(request, current_user, version, "html", filters, cursor, limit)
+            if etags.is_fresh(request, etag):
+                return etags.not_modified(etag)
+            games, next_cursor = _cached_page(db, filters, cursor, limit, version)
     except DatabaseError:
         raise HTTPException(500, "Unable to load game history")
 
-    return templates.TemplateResponse(
+    return etags.tagged(templates.TemplateResponse(
         "history.html",
         {
-            "request":    request,
-            "games":      games,
-            "csrf_token": request.session.get("csrf_token"),
+            "request":     request,
+            "games":       games,
+            "filters":     filters,
+            "next_cursor": next_cursor,
+            "page_size":   limit,
+            "csrf_token":  request.session.get("csrf_token"),
         }
-    )
+    ), etag)
+
+
+@router.get("/api/history", name="history_api")
+def history_api(request: Request, current_user=Depends(get_current_user)):
+    """JSON pages of the game history, for infinite scroll."""
+    if not current_user:
+        return JSONResponse({"error": "Not authenticated"}, status_code=401)
+    filters = _parse_filters(request)
+    cursor = _parse_cursor(request.query_params.get("cursor", ""))
+    limit = _page_size(request)
+    try:
+        with get_db() as db:
+            version = versions.current(db, versions.GLOBAL)
+            etag = etags.page_etag(request, current_user, version, "json", filters, cursor, limit)
+            if etags.is_fresh(request, etag):
+                return etags.not_modified(etag)
+            games, next_cursor = _cached_page(db, filters, cursor, limit, version)
+    except DatabaseError:
+        raise HTTPException(500, "Unable to load game history")
+
+    return etags.tagged(JSONResponse({
+        "games": [
+            {
+                "id":     g["id"],
+                "date":   g["date"],
+                "winner": g["winner"],
+                "amount": g["amount"],
+                "url":    str(request.url_for("history_detail", game_id=g["id"])),
+            }
+            for g in games
+        ],
+        "next_cursor": next_cursor,
+    }), etag)
 
 
 @router.get(
@@ -49,6 +184,11 @@ def game_detail(request: Request, game_id: int, current_user=Depends(get_current
         return RedirectResponse("/login", status_code=302)
     try:
         with get_db() as db:
+            etag = etags.page_etag(
+                request, current_user, versions.current(db, versions.GLOBAL), game_id
+            )
+            if etags.is_fresh(request, etag):
+                return etags.not_modified(etag)
             game = db.execute(
                 "SELECT id, date, buyin FROM games WHERE id = ?",
                 (game_id,)
@@ -71,7 +211,7 @@ def game_detail(request: Request, game_id: int, current_user=Depends(get_current
     # sqlite3.Row does not implement .get()
     is_admin = bool(current_user["is_admin"])
 
-    return templates.TemplateResponse(
+    return etags.tagged(templates.TemplateResponse(
         "game_detail.html",
         {
             "request":    request,
@@ -80,7 +220,7 @@ def game_detail(request: Request, game_id: int, current_user=Depends(get_current
             "is_admin":   is_admin,
             "csrf_token": request.session.get("csrf_token"),
         }
-    )
+    ), etag)
 
 
 @router.post(
@@ -103,7 +243,7 @@ def update_player_amount(
     try:
         with get_db() as db:
             prev = db.execute(
-                "SELECT net FROM game_players WHERE game_id = ? AND username = ?",
+                "SELECT net, rebuys FROM game_players WHERE game_id = ? AND username = ?",
                 (game_id, username)
             ).fetchone()
             if not prev:
@@ -111,7 +251,7 @@ def update_player_amount(
             old_net = prev["net"]
 
             game = db.execute(
-                "SELECT buyin FROM games WHERE id = ?", (game_id,)
+                "SELECT date, buyin FROM games WHERE id = ?", (game_id,)
             ).fetchone()
             if not game:
                 raise HTTPException(404, "Game not found")
@@ -140,19 +280,19 @@ def update_player_amount(
                 """,
                 (game_id, game_id)
             )
-            db.execute(
-                """
-                INSERT INTO admin_log (actor, action, target, timestamp)
-                     VALUES (?, ?, ?, datetime('now'))
-                """,
-                (
-                    current_user["username"],
-                    f"Updated game {game_id}: {username} → cashout={cashout}, rebuys={rebuys}, net={new_net}",
-                    username
-                )
+            aggregates.record_edit(
+                db, username, game["date"], new_net - old_net, rebuys - prev["rebuys"]
             )
+            versions.bump_players(db, username)
             db.commit()
     except DatabaseError:
         raise HTTPException(500, "Unable to update player data")
+    audit.log_admin(
+        current_user["username"],
+        f"Updated game {game_id}: {username} → cashout={cashout}, rebuys={rebuys}, net={new_net}",
+        username,
+        request.client.host,
+    )
+    invalidate_user(username)
 
     return RedirectResponse(f"/history/{game_id}", status_code=303)
@@ -1,12 +1,46 @@
-from fastapi import APIRouter, Request, Depends
+from fastapi import APIRouter, Request, Depends, HTTPException
 from fastapi.responses import RedirectResponse, HTMLResponse
-from fastapi.templating import Jinja2Templates
 
+import etags
+import page_cache
+import versions
+from config import LEADERBOARD_PAGE_SIZE, LEADERBOARD_MAX_PAGE
 from deps import get_current_user
-from db import get_db
+from db import run_db
+from templating import templates
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
+
+# sort key -> ORDER BY; each matches one players index, username breaks ties
+ORDER_MAP = {
+    "username":    "username ASC",
+    "games":       "games_played DESC, username",
+    "rebuys":      "total_rebuys DESC, username",
+    "balance":     "balance DESC, username",
+}
+
+
+def _parse_page(value: str) -> int:
+    """1-based page number; anything else (or absurdly far) is a 400."""
+    try:
+        page = int(value)
+    except ValueError:
+        raise HTTPException(400, "Invalid page")
+    if not 1 <= page <= LEADERBOARD_MAX_PAGE:
+        raise HTTPException(400, "Invalid page")
+    return page
+
+
+def _load_page(conn, order_by: str, offset: int):
+    # safe to interpolate because order_by only comes from ORDER_MAP;
+    # fetch one extra row to know whether another page exists
+    rows = conn.execute(f"""
+        SELECT username, balance, avatar_path, games_played, total_rebuys
+          FROM players
+         ORDER BY {order_by}
+         LIMIT ? OFFSET ?
+    """, (LEADERBOARD_PAGE_SIZE + 1, offset)).fetchall()
+    return rows[:LEADERBOARD_PAGE_SIZE], len(rows) > LEADERBOARD_PAGE_SIZE
 
 
 @router.get("/leaderboard", response_class=HTMLResponse)
@@ -18,36 +52,32 @@ async def leaderboard(
     if not current_user:
         return RedirectResponse("/login", status_code=302)
 
-    # 2) sanitize sort param against an allowlist
+    # 2) sanitize sort and page params; the sort key comes from an allowlist
     sort_key = request.query_params.get("sort", "balance")
-    order_map = {
-        "username":    "p.username ASC",
-        "games":       "games_played DESC",
-        "rebuys":      "total_rebuys DESC",
-        "balance":     "p.balance DESC",
-    }
-    order_by = order_map.get(sort_key, order_map["balance"])
-
-    # 3) safe to interpolate because order_by only comes from our allowlist
-    with get_db() as conn:
-        players = conn.execute(f"""
-            SELECT 
-                p.username,
-                p.balance,
-                p.avatar_path,
-                COUNT(DISTINCT gp.game_id)       AS games_played,
-                COALESCE(SUM(gp.rebuys), 0)      AS total_rebuys
-            FROM players p
-            LEFT JOIN game_players gp ON p.username = gp.username
-            GROUP BY p.username, p.balance, p.avatar_path
-            ORDER BY {order_by}
-        """).fetchall()
-
-    return templates.TemplateResponse(
+    if sort_key not in ORDER_MAP:
+        sort_key = "balance"
+    page = _parse_page(request.query_params.get("page", "1"))
+    offset = (page - 1) * LEADERBOARD_PAGE_SIZE
+
+    # 3) (sort, page) is the whole cache key; entries live until the next write
+    # (async handler: database work goes through run_db, off the event loop)
+    version = await run_db(versions.current, versions.GLOBAL)
+    etag = etags.page_etag(request, current_user, version, sort_key, page)
+    if etags.is_fresh(request, etag):
+        return etags.not_modified(etag)
+    players, has_next = await run_db(
+        page_cache.cached_context, "leaderboard", (sort_key, page),
+        lambda conn: _load_page(conn, ORDER_MAP[sort_key], offset), version,
+    )
+
+    return etags.tagged(templates.TemplateResponse(
         "leaderboard.html",
         {
             "request":      request,
             "players":      players,
             "current_sort": sort_key,
+            "page":         page,
+            "offset":       offset,
+            "has_next":     has_next,
         }
-    )
+    ), etag)
@@ -1,27 +1,25 @@
 from fastapi import APIRouter, Request, Form, Depends, HTTPException
 from fastapi.responses import RedirectResponse, HTMLResponse
-from fastapi.templating import Jinja2Templates
-from passlib.context import CryptContext
 from db import get_db
-from deps import get_current_user, generate_csrf, verify_csrf
+from templating import templates
+from deps import get_current_user, generate_csrf, verify_csrf, invalidate_user
 from datetime import datetime
+from passwords import pwd
+import versions
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
-pwd = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 @router.get("/profile", response_class=HTMLResponse, dependencies=[Depends(generate_csrf)])
 def profile(request: Request, user=Depends(get_current_user)):
     if not user:
         return RedirectResponse("/login", status_code=302)
     with get_db() as db:
-        full_user = db.execute("SELECT * FROM players WHERE username = ?", (user["username"],)).fetchone()
         history = db.execute(
             "SELECT date, amount FROM games WHERE winner = ? ORDER BY date DESC", (user["username"],)
         ).fetchall()
 
     # Safely access avatar_path column
-    avatar = full_user["avatar_path"] if "avatar_path" in full_user.keys() else None
+    avatar = user["avatar_path"] if "avatar_path" in user.keys() else None
 
     return templates.TemplateResponse(
         "profile.html",
@@ -58,13 +56,13 @@ def change_password(
                 "UPDATE players SET password = ? WHERE username = ?", (hashed, user["username"])
             )
             db.commit()
+        invalidate_user(user["username"])
         msg = "Password updated successfully."
     with get_db() as db:
-        full_user = db.execute("SELECT * FROM players WHERE username = ?", (user["username"],)).fetchone()
         history = db.execute(
             "SELECT date, amount FROM games WHERE winner = ? ORDER BY date DESC", (user["username"],)
         ).fetchall()
-    avatar = full_user["avatar_path"] if "avatar_path" in full_user.keys() else None
+    avatar = user["avatar_path"] if "avatar_path" in user.keys() else None
     return templates.TemplateResponse(
         "profile.html",
         {
@@ -92,12 +90,13 @@ def update_avatar(
         db.execute(
             "UPDATE players SET avatar_path = ? WHERE username = ?", (avatar_path, user["username"])
         )
+        versions.bump_players(db, user["username"])
         db.commit()
-        full_user = db.execute("SELECT * FROM players WHERE username = ?", (user["username"],)).fetchone()
         history = db.execute(
             "SELECT date, amount FROM games WHERE winner = ? ORDER BY date DESC", (user["username"],)
         ).fetchall()
-    avatar = full_user["avatar_path"] if "avatar_path" in full_user.keys() else None
+    invalidate_user(user["username"])
+    avatar = avatar_path
     return templates.TemplateResponse(
         "profile.html",
         {
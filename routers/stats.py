@@ -1,273 +1,167 @@
 from fastapi import APIRouter, Request
 from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
-from collections import defaultdict
 from datetime import datetime
 import calendar
 
+import aggregates
+import avatars
+import etags
+import page_cache
+import stats_engine
+import versions
 from deps import get_current_user
 from db import get_db
+from templating import templates
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
 
-
-@router.get("/stats")
-def stats(request: Request):
-    user = get_current_user(request)
-    if not user:
-        return RedirectResponse("/login", status_code=302)
-
-    today = datetime.now()
+# avatar context key -> username context key
+AVATAR_FIELDS = {
+    "player_of_month_avatar": "player_of_month",
+    "biggest_winner_avatar": "biggest_winner",
+    "worst_loser_avatar": "worst_loser",
+    "top_earner_avatar": "top_earner",
+    "top_loser_avatar": "top_loser",
+    "roi_user_avatar": "roi_user",
+    "most_consistent_avatar": "most_consistent_user",
+    "comeback_avatar": "comeback_user",
+    "top_rebuyer_avatar": "top_rebuyer",
+}
+
+
+def _stats_context(db, today: datetime) -> dict:
     days_in_month = calendar.monthrange(today.year, today.month)[1]
     is_final_week = today.day > (days_in_month - 7)
     days_left = days_in_month - today.day + 1
     current_month = today.strftime("%Y-%m")
 
-    with get_db() as db:
-        # ── avatars helper ─────────────────────────────────────────────
-        def get_avatar(username):
-            if not username or username == "N/A":
-                return None
-            row = db.execute(
-                "SELECT avatar_path FROM players WHERE username = ?", (username,)
-            ).fetchone()
-            return row["avatar_path"] if row and row["avatar_path"] else None
-
-        # ── MONTHLY STATS ──────────────────────────────────────────────
-        # fetch monthly games and players
-        monthly_game_ids = [r["id"] for r in db.execute(
-            "SELECT id FROM games WHERE strftime('%Y-%m', date)=?",
+    # ── MONTHLY STATS ──────────────────────────────────────────────
+    # per-player totals for the month, maintained on write
+    total_games = db.execute(
+        "SELECT COUNT(*) FROM games WHERE month = ?",
+        (current_month,),
+    ).fetchone()[0]
+    mstats = aggregates.load_period(db, current_month)
+    awards = stats_engine.compute_awards(mstats, stats_engine.MONTH)
+    top_three = [{"username":u,"net":v["net"]} for u,v in awards.pop("top_three")]
+
+    monthly_ctx = {
+        "total_games": total_games,
+        "total_money": db.execute(
+            "SELECT COALESCE(SUM(amount),0) FROM games WHERE month = ?",
             (current_month,),
-        ).fetchall()]
-
-        monthly_players = db.execute(
-            "SELECT username, net, buyin, rebuys, game_id FROM game_players "
-            "WHERE game_id IN ({seq})".format(
-                seq=",".join("?"*len(monthly_game_ids))
-            ),
-            tuple(monthly_game_ids)
-        ).fetchall() if monthly_game_ids else []
-
-        # aggregate per-user
-        mstats = defaultdict(lambda: {"net":0,"buyin":0,"rebuys":0,"games":set()})
-        for r in monthly_players:
-            u=r["username"]; mstats[u]["net"]+=r["net"]
-            mstats[u]["buyin"]+=r["buyin"] + r["rebuys"]*r["buyin"]
-            mstats[u]["rebuys"]+=r["rebuys"]; mstats[u]["games"].add(r["game_id"])
-        # pickers
-        def potm_score(item):
-            u,v=item
-            roi = (v["net"]/v["buyin"]*100) if v["buyin"]>0 else 0
-            return v["net"] + roi*2 + len(v["games"])*5 - v["rebuys"]*2
-        potm = max(mstats.items(), key=potm_score, default=("N/A",{}))
-        top_three_raw = sorted(mstats.items(), key=potm_score, reverse=True)[:3]
-        top_three = [{"username":u,"net":v["net"],"avatar":get_avatar(u)} for u,v in top_three_raw]
-
-        monthly_ctx = {
-            "total_games": len(monthly_game_ids),
-            "total_money": db.execute(
-                "SELECT COALESCE(SUM(amount),0) FROM games WHERE strftime('%Y-%m',date)=?",
-                (current_month,),
-            ).fetchone()[0],
-            "biggest_win": db.execute(
-                "SELECT MAX(amount) FROM games WHERE strftime('%Y-%m',date)=?",
-                (current_month,),
-            ).fetchone()[0] or 0,
-            "biggest_winner": (db.execute(
-                "SELECT winner FROM games WHERE strftime('%Y-%m',date)=? ORDER BY amount DESC LIMIT 1",
-                (current_month,),
-            ).fetchone() or {"winner": "N/A"})["winner"],
-            "worst_loss": db.execute(
-                "SELECT MIN(net) FROM game_players WHERE game_id IN ({seq})".format(
-                    seq=",".join("?"*len(monthly_game_ids))
-                ),
-                tuple(monthly_game_ids),
-            ).fetchone()[0] or 0,
-            "worst_loser": (db.execute(
-                "SELECT username FROM game_players WHERE game_id IN ({seq}) ORDER BY net ASC LIMIT 1".format(
-                    seq=",".join("?"*len(monthly_game_ids))
-                ),
-                tuple(monthly_game_ids),
-            ).fetchone() or {"username": "N/A"})["username"],
-            "top_earner": max(mstats.items(), key=lambda x:x[1]["net"], default=("N/A",{}))[0],
-            "top_earner_amount": max(mstats.items(), key=lambda x:x[1]["net"], default=("",{"net":0}))[1]["net"],
-            "top_loser": min(mstats.items(), key=lambda x:x[1]["net"], default=("N/A",{}))[0],
-            "top_loser_amount": min(mstats.items(), key=lambda x:x[1]["net"], default=("",{"net":0}))[1]["net"],
-            "top_rebuyer": max(mstats.items(), key=lambda x:x[1]["rebuys"], default=("N/A",{}))[0],
-            "total_rebuys": max(mstats.items(), key=lambda x:x[1]["rebuys"], default=("",{"rebuys":0}))[1]["rebuys"],
-            "best_roi": max(
-                ((u,round(v["net"]/v["buyin"]*100,2)) for u,v in mstats.items() if v["buyin"]>0),
-                key=lambda x:x[1], default=("N/A",0)
-            )[1],
-            "roi_user": max(
-                ((u,round(v["net"]/v["buyin"]*100,2)) for u,v in mstats.items() if v["buyin"]>0),
-                key=lambda x:x[1], default=("N/A",0)
-            )[0],
-            "most_consistent_user": min(
-                ((u,abs(v["net"])) for u,v in mstats.items() if len(v["games"])>=3),
-                key=lambda x:x[1], default=("N/A",0)
-            )[0],
-            "consistent_user_avg": min(
-                ((u,abs(v["net"])) for u,v in mstats.items() if len(v["games"])>=3),
-                key=lambda x:x[1], default=("N/A",0)
-            )[1],
-            "player_of_month": potm[0],
-            "player_of_month_avatar": get_avatar(potm[0]),
-            "comeback_user": max(
-                ((u,v) for u,v in mstats.items() if v["net"]>0 and v["rebuys"]>=2),
-                key=lambda x:x[1]["net"], default=("N/A",{"net":0})
-            )[0],
-            "comeback_net": max(
-                ((u,v) for u,v in mstats.items() if v["net"]>0 and v["rebuys"]>=2),
-                key=lambda x:x[1]["net"], default=("N/A",{"net":0})
-            )[1]["net"],
-            "most_games_user": max(mstats.items(), key=lambda x:len(x[1]["games"]), default=("N/A",{"games":set()}))[0],
-            "most_games_count": len(max(mstats.items(), key=lambda x:len(x[1]["games"]), default=("",{"games":set()}))[1]["games"]),
-            "top_monthly_earners": db.execute(
-                "SELECT username, SUM(net) AS net FROM game_players WHERE game_id IN ({}) GROUP BY username ORDER BY net DESC LIMIT 5".format(",".join("?"*len(monthly_game_ids))),
-                tuple(monthly_game_ids),
-            ).fetchall(),
-            "is_final_week": is_final_week,
-            "days_left": days_left,
-            "top_three": top_three,
+        ).fetchone()[0],
+        "biggest_win": db.execute(
+            "SELECT MAX(amount) FROM games WHERE month = ?",
+            (current_month,),
+        ).fetchone()[0] or 0,
+        "biggest_winner": (db.execute(
+            "SELECT winner FROM games WHERE month = ? ORDER BY amount DESC LIMIT 1",
+            (current_month,),
+        ).fetchone() or {"winner": "N/A"})["winner"],
+        **awards,
+        "is_final_week": is_final_week,
+        "days_left": days_left,
+        "top_three": top_three,
+    }
+
+    # Format monthly earners
+    monthly_ctx["top_monthly_earners"] = [
+        {
+            "username": username,
+            "net": v["net"],
+            "initial": username[0].upper() if username else "?"
         }
-
-        # Add avatars for monthly context
-        monthly_ctx.update({
-            "biggest_winner_avatar": get_avatar(monthly_ctx["biggest_winner"]),
-            "worst_loser_avatar": get_avatar(monthly_ctx["worst_loser"]),
-            "top_earner_avatar": get_avatar(monthly_ctx["top_earner"]),
-            "top_loser_avatar": get_avatar(monthly_ctx["top_loser"]),
-            "roi_user_avatar": get_avatar(monthly_ctx["roi_user"]),
-            "most_consistent_avatar": get_avatar(monthly_ctx["most_consistent_user"]),
-            "comeback_avatar": get_avatar(monthly_ctx["comeback_user"]),
-            "top_rebuyer_avatar": get_avatar(monthly_ctx["top_rebuyer"])
-        })
-
-        # Format monthly earners
-        monthly_earners = []
-        for row in monthly_ctx["top_monthly_earners"]:
-            monthly_earners.append({
-                "username": row["username"],
-                "net": row["net"],
-                "avatar": get_avatar(row["username"]),
-                "initial": row["username"][0].upper() if row["username"] else "?"
-            })
-        monthly_ctx["top_monthly_earners"] = monthly_earners
-
-        # ── GLOBAL STATS ────────────────────────────────────────────────
-        gstats = defaultdict(lambda: {"net":0,"buyin":0,"rebuys":0,"games":set()})
-        all_players = db.execute(
-            "SELECT username, net, buyin, rebuys, game_id FROM game_players"
-        ).fetchall()
-        for r in all_players:
-            u=r["username"]; gstats[u]["net"]+=r["net"]
-            gstats[u]["buyin"]+=r["buyin"]+r["rebuys"]*r["buyin"]
-            gstats[u]["rebuys"]+=r["rebuys"]; gstats[u]["games"].add(r["game_id"])
-
-        global_ctx = {
-            "total_games": db.execute("SELECT COUNT(*) FROM games").fetchone()[0],
-            "total_money": db.execute("SELECT COALESCE(SUM(amount),0) FROM games").fetchone()[0],
-            "biggest_win": db.execute("SELECT MAX(amount) FROM games").fetchone()[0] or 0,
-            "biggest_winner": (db.execute(
-                "SELECT winner FROM games ORDER BY amount DESC LIMIT 1"
-            ).fetchone() or {"winner": "N/A"})["winner"],
-            "worst_loss": db.execute("SELECT MIN(net) FROM game_players").fetchone()[0] or 0,
-            "worst_loser": (db.execute(
-                "SELECT username FROM game_players ORDER BY net ASC LIMIT 1"
-            ).fetchone() or {"username": "N/A"})["username"],
-            "top_earner": (max(gstats.items(), key=lambda x:x[1]["net"], default=("N/A",{})))[0],
-            "top_earner_amount": (max(gstats.items(), key=lambda x:x[1]["net"], default=("",{"net":0})))[1]["net"],
-            "top_loser": (min(gstats.items(), key=lambda x:x[1]["net"], default=("N/A",{})))[0],
-            "top_loser_amount": (min(gstats.items(), key=lambda x:x[1]["net"], default=("",{"net":0})))[1]["net"],
-            "top_rebuyer": (max(gstats.items(), key=lambda x:x[1]["rebuys"], default=("N/A",{})))[0],
-            "total_rebuys": (max(gstats.items(), key=lambda x:x[1]["rebuys"], default=("",{"rebuys":0})))[1]["rebuys"],
-            "best_roi": (max(
-                ((u,round(v["net"]/v["buyin"]*100,2)) for u,v in gstats.items() if v["buyin"]>0),
-                key=lambda x:x[1], default=("N/A",0)
-            ))[1],
-            "roi_user": (max(
-                ((u,round(v["net"]/v["buyin"]*100,2)) for u,v in gstats.items() if v["buyin"]>0),
-                key=lambda x:x[1], default=("N/A",0)
-            ))[0],
-            "most_consistent_user": (min(
-                ((u,abs(v["net"])) for u,v in gstats.items() if len(v["games"])>=3),
-                key=lambda x:x[1], default=("N/A",0)
-            ))[0],
-            "consistent_user_avg": (min(
-                ((u,abs(v["net"])) for u,v in gstats.items() if len(v["games"])>=3),
-                key=lambda x:x[1], default=("N/A",0)
-            ))[1],
-            "comeback_user": (max(
-                ((u,v) for u,v in gstats.items() if v["net"]>0 and v["rebuys"]>=2),
-                key=lambda x:x[1]["net"], default=("N/A",{"net":0})
-            ))[0],
-            "comeback_net": (max(
-                ((u,v) for u,v in gstats.items() if v["net"]>0 and v["rebuys"]>=2),
-                key=lambda x:x[1]["net"], default=("N/A",{"net":0})
-            ))[1]["net"],
-            "most_games_user": (max(gstats.items(), key=lambda x:len(x[1]["games"]), default=("N/A",{"games":set()})))[0],
-            "most_games_count": len((max(gstats.items(), key=lambda x:len(x[1]["games"]), default=("",{"games":set()})))[1]["games"])
+        for username, v in monthly_ctx.pop("top_earners")
+    ]
+
+    # ── GLOBAL STATS ────────────────────────────────────────────────
+    gstats = aggregates.load_period(db, aggregates.ALL_TIME)
+
+    global_ctx = {
+        "total_games": db.execute("SELECT COUNT(*) FROM games").fetchone()[0],
+        "total_money": db.execute("SELECT COALESCE(SUM(amount),0) FROM games").fetchone()[0],
+        "biggest_win": db.execute("SELECT MAX(amount) FROM games").fetchone()[0] or 0,
+        "biggest_winner": (db.execute(
+            "SELECT winner FROM games ORDER BY amount DESC LIMIT 1"
+        ).fetchone() or {"winner": "N/A"})["winner"],
+        **stats_engine.compute_awards(gstats, stats_engine.ALL_TIME),
+    }
+
+    # Format global earners with initials
+    global_ctx["top_global_earners"] = [
+        {
+            "username": username,
+            "net": v["net"],
+            "initial": username[0].upper() if username else "?"
         }
-
-        # Add avatars for global context
-        global_ctx.update({
-            "biggest_winner_avatar": get_avatar(global_ctx["biggest_winner"]),
-            "worst_loser_avatar": get_avatar(global_ctx["worst_loser"]),
-            "top_earner_avatar": get_avatar(global_ctx["top_earner"]),
-            "top_loser_avatar": get_avatar(global_ctx["top_loser"]),
-            "roi_user_avatar": get_avatar(global_ctx["roi_user"]),
-            "most_consistent_avatar": get_avatar(global_ctx["most_consistent_user"]),
-            "comeback_avatar": get_avatar(global_ctx["comeback_user"]),
-            "top_rebuyer_avatar": get_avatar(global_ctx["top_rebuyer"])
+        for username, v in global_ctx.pop("top_earners")
+    ]
+
+    # Format POTM history with avatars
+    potm_history = []
+    for row in db.execute(
+        "SELECT month, username, avatar_path FROM potm_history ORDER BY month DESC"
+    ).fetchall():
+        potm_history.append({
+            "month": row["month"],
+            "username": row["username"],
+            "avatar_path": row["avatar_path"] or None,
+            "initial": row["username"][0].upper() if row["username"] else "?"
         })
+    global_ctx["potm_history"] = potm_history
+
+    # ── avatars: one query for every player shown on the page ─────
+    listed = top_three + monthly_ctx["top_monthly_earners"] + global_ctx["top_global_earners"]
+    names = [p["username"] for p in listed]
+    for ctx in [monthly_ctx, global_ctx]:
+        names += [ctx.get(key) for key in AVATAR_FIELDS.values()]
+    avatar_of = avatars.load_avatars(db, names)
+
+    for ctx in [monthly_ctx, global_ctx]:
+        avatars.fill_avatars(ctx, AVATAR_FIELDS, avatar_of)
+    for p in listed:
+        p["avatar"] = avatar_of.get(p["username"])
+
+    # Helper function to format username initials
+    def format_username_initial(username):
+        if username and username != "N/A":
+            return username[0].upper()
+        return "?"
+
+    # Add formatted initials for both contexts
+    for ctx in [monthly_ctx, global_ctx]:
+        ctx["formatted_initials"] = {
+            key: format_username_initial(ctx.get(key, ""))
+            for key in [
+                "biggest_winner", "worst_loser", "top_earner", "top_loser",
+                "roi_user", "most_consistent_user", "comeback_user", "top_rebuyer",
+                "most_games_user"
+            ]
+        }
 
-        # Format global earners with avatars and initials
-        global_earners = []
-        for row in db.execute(
-            "SELECT username, SUM(net) AS net FROM game_players GROUP BY username ORDER BY net DESC LIMIT 5"
-        ).fetchall():
-            global_earners.append({
-                "username": row["username"],
-                "net": row["net"],
-                "avatar": get_avatar(row["username"]),
-                "initial": row["username"][0].upper() if row["username"] else "?"
-            })
-        global_ctx["top_global_earners"] = global_earners
-
-        # Format POTM history with avatars
-        potm_history = []
-        for row in db.execute(
-            "SELECT month, username, avatar_path FROM potm_history ORDER BY month DESC"
-        ).fetchall():
-            potm_history.append({
-                "month": row["month"],
-                "username": row["username"],
-                "avatar_path": row["avatar_path"] or None,
-                "initial": row["username"][0].upper() if row["username"] else "?"
-            })
-        global_ctx["potm_history"] = potm_history
+    return {"m": monthly_ctx, "g": global_ctx}
 
-        # Helper function to format username initials
-        def format_username_initial(username):
-            if username and username != "N/A":
-                return username[0].upper()
-            return "?"
 
-        # Add formatted initials for both contexts
-        for ctx in [monthly_ctx, global_ctx]:
-            ctx["formatted_initials"] = {
-                key: format_username_initial(ctx.get(key, ""))
-                for key in [
-                    "biggest_winner", "worst_loser", "top_earner", "top_loser",
-                    "roi_user", "most_consistent_user", "comeback_user", "top_rebuyer",
-                    "most_games_user"
-                ]
-            }
+@router.get("/stats")
+def stats(request: Request):
+    user = get_current_user(request)
+    if not user:
+        return RedirectResponse("/login", status_code=302)
 
-        return templates.TemplateResponse("stats.html", {
-            "request": request,
-            "m": monthly_ctx,
-            "g": global_ctx
-        })
\ No newline at end of file
+    # days_left and the month roll over daily, so the date is part of the key
+    today = datetime.now()
+    day = today.strftime("%Y-%m-%d")
+    with get_db() as db:
+        version = versions.current(db, versions.GLOBAL)
+        etag = etags.page_etag(request, user, version, day)
+        if etags.is_fresh(request, etag):
+            return etags.not_modified(etag)
+        ctx = page_cache.cached_context(
+            db, "stats", (day,),
+            lambda db: _stats_context(db, today), version,
+        )
+
+    return etags.tagged(
+        templates.TemplateResponse("stats.html", {"request": request, **ctx}), etag
+    )
@@ -0,0 +1,50 @@
+"""
+A tiny in-process scheduler for periodic maintenance jobs.
+
+Jobs are plain functions taking a database connection. Each runs once at
+startup and then every `interval` seconds, on the database thread pool
+(db.run_db), never on the event loop. A failing run is logged and retried
+at the next interval. Every worker process runs its own scheduler, so
+jobs must be idempotent; the ones registered in main.py are.
+"""
+import asyncio
+import time
+
+from db import run_db
+
+
+class Scheduler:
+    def __init__(self):
+        self._jobs = []
+        self._tasks = []
+
+    def every(self, interval: float, fn, name: str = None):
+        """Register fn(db) to run every `interval` seconds (<= 0 disables it)."""
+        if interval > 0:
+            self._jobs.append((name or fn.__name__, interval, fn))
+
+    async def _loop(self, name: str, interval: float, fn):
+        while True:
+            start = time.monotonic()
+            try:
+                result = await run_db(fn)
+                if result:
+                    print(f"[scheduler] {name}: {result}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[scheduler] {name} failed: {e!r}")
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - start)))
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        for name, interval, fn in self._jobs:
+            self._tasks.append(loop.create_task(self._loop(name, interval, fn)))
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+
+
+scheduler = Scheduler()
@@ -0,0 +1,158 @@
+"""
+Shared setup for the benchmark scripts in this directory.
+
+Importing this module points DATABASE_URL (and the paths derived from it)
+at a throwaway directory, so it must come before any app import:
+
+    import _bench
+    import db as database
+
+Nothing here touches data/.
+"""
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TMP = tempfile.mkdtemp(prefix="poker-bench-")
+os.environ.setdefault("DATABASE_URL", os.path.join(TMP, "poker.db"))
+os.environ.setdefault("TEMPLATE_CACHE_DIR", os.path.join(TMP, "jinja"))
+os.environ.setdefault("SESSION_SECRET", "bench-session-secret")
+sys.path.insert(0, ROOT)
+
+PASSWORD = "secret123"
+
+
+def percentile(samples, p):
+    """p-th percentile (0-100) of samples, nearest-rank."""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def report(label, samples):
+    """Print n, p50 and p99 of a list of durations in seconds."""
+    print(
+        f"{label:<32} n={len(samples):<6} "
+        f"p50={percentile(samples, 50) * 1000:8.2f} ms  "
+        f"p99={percentile(samples, 99) * 1000:8.2f} ms  "
+        f"mean={statistics.mean(samples) * 1000:8.2f} ms"
+    )
+
+
+def timed(fn, *args):
+    """Run fn(*args); return (duration in seconds, result)."""
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def seed(conn, players: int, rows: int, per_game: int = 10, random_seed: int = 0):
+    """
+    Bulk-load `players` players and `rows` game_players rows, `per_game` to a
+    game, spread over the last few years, then rebuild the summary tables.
+    Goes straight to executemany; ledger.insert_game is far too slow for
+    this many rows.
+    """
+    import aggregates
+    from passwords import pwd
+
+    rng = random.Random(random_seed)
+    names = [f"player{i}" for i in range(players)]
+    password = pwd.hash(PASSWORD)
+    conn.executemany(
+        "INSERT INTO players (username, password, avatar_path) VALUES (?, ?, ?)",
+        [(name, password, f"/static/avatars/{name}.png") for name in names]
+    )
+
+    games = rows // per_game
+    first = date.today() - timedelta(days=games // 20)
+    game_rows, player_rows = [], []
+    for game_id in range(1, games + 1):
+        day = (first + timedelta(days=game_id // 20)).isoformat()
+        buyin = rng.choice((20, 50, 100))
+        seated = []
+        for username in rng.sample(names, per_game):
+            rebuys = rng.choice((0, 0, 0, 1, 2))
+            cashout = rng.randint(0, buyin * 3)
+            net = cashout - buyin * (rebuys + 1)
+            seated.append((game_id, username, buyin, rebuys, cashout, net))
+        winner = max(seated, key=lambda r: r[5])
+        game_rows.append((game_id, day, winner[1], winner[5], winner[3], buyin))
+        player_rows += seated
+
+    conn.executemany(
+        "INSERT INTO games (id, date, winner, amount, rebuys, buyin) VALUES (?, ?, ?, ?, ?, ?)",
+        game_rows
+    )
+    conn.executemany(
+        "INSERT INTO game_players (game_id, username, buyin, rebuys, cashout, net) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        player_rows
+    )
+    conn.execute(
+        "UPDATE players SET balance = (SELECT COALESCE(SUM(net), 0) FROM game_players gp "
+        "WHERE gp.username = players.username)"
+    )
+    aggregates.rebuild(conn)
+    conn.commit()
+    return names
+
+
+def csrf_token(html: str) -> str:
+    return re.search(r'name="csrf_token" value="([^"]+)"', html).group(1)
+
+
+def login(client, username: str, password: str = PASSWORD, **kwargs):
+    """Log `client` (a TestClient or httpx.Client) in through the form."""
+    token = csrf_token(client.get("/login", **kwargs).text)
+    return client.post(
+        "/login",
+        data={"username": username, "password": password, "csrf_token": token},
+        follow_redirects=False,
+        **kwargs
+    )
+
+
+@contextmanager
+def serve(workers: int = 1, **env):
+    """
+    Run the app under uvicorn against the scratch database; yields its base
+    URL. X-Forwarded-For is trusted, so load generators can spread requests
+    over many client IPs instead of tripping the per-IP limits.
+    """
+    import httpx
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--workers", str(workers), "--proxy-headers", "--forwarded-allow-ips", "*",
+         "--log-level", "warning"],
+        cwd=ROOT, env={**os.environ, **env}
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                httpx.get(url + "/login", timeout=1)
+                break
+            except httpx.TransportError:
+                if proc.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("uvicorn did not start")
+                time.sleep(0.2)
+        yield url
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
@@ -0,0 +1,144 @@
+"""
+Write cost of one 40-player game: the old per-row path against add_game's.
+
+"per-row" replays the write add_game used to do: a placeholder games row,
+one INSERT and one UPDATE per player, then a final UPDATE of the winner.
+"batched" writes the same three tables the way ledger.insert_game does:
+winner first, one executemany, one CASE update, inside BEGIN IMMEDIATE.
+"add_game" calls the router's _save_game, which on top of that keeps the
+summary tables and data versions current.
+
+"calls" counts execute()/executemany() round trips into sqlite3;
+"statements" counts statements SQLite ran (every executemany row is one).
+
+    python scripts/bench_add_game.py [--players 40] [--games 200]
+"""
+import argparse
+import random
+
+import _bench
+
+import db as database
+import ledger
+
+
+class _Counting:
+    """Connection proxy counting execute()/executemany() calls."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.calls = 0
+
+    def execute(self, *args):
+        self.calls += 1
+        return self.conn.execute(*args)
+
+    def executemany(self, *args):
+        self.calls += 1
+        return self.conn.executemany(*args)
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+
+def _selected(form):
+    return [
+        (username, int(form[f"amount_{username}"]), int(form[f"rebuys_{username}"]))
+        for username in (key[5:] for key in form if key.startswith("play_"))
+    ]
+
+
+def per_row(db, date, buyin_val, form):
+    selected = _selected(form)
+    total_rebuys = sum(rebuys for _, _, rebuys in selected)
+    game_id = db.execute(
+        "INSERT INTO games (date, winner, amount, rebuys, buyin) VALUES (?, ?, ?, ?, ?)",
+        (date, "", 0, total_rebuys, buyin_val)
+    ).lastrowid
+    winner = None
+    highest = -1
+    for usern, cash, rebuys in selected:
+        net = cash - buyin_val * (1 + rebuys)
+        if cash > highest:
+            highest = cash
+            winner = usern
+        db.execute(
+            "INSERT INTO game_players (game_id, username, buyin, rebuys, cashout, net) VALUES (?, ?, ?, ?, ?, ?)",
+            (game_id, usern, buyin_val, rebuys, cash, net)
+        )
+        db.execute(
+            "UPDATE players SET balance = balance + ? WHERE username = ?",
+            (net, usern)
+        )
+    db.execute(
+        "UPDATE games SET winner = ?, amount = ? WHERE id = ?",
+        (winner, highest - (buyin_val * (1 + next(r for r in selected if r[0] == winner)[2])), game_id)
+    )
+    db.commit()
+
+
+def batched(db, date, buyin_val, form):
+    results = ledger.game_results(buyin_val, _selected(form))
+    winner, _, _, amount = max(results, key=lambda r: r[1])
+    db.execute("BEGIN IMMEDIATE")
+    game_id = db.execute(
+        "INSERT INTO games (date, winner, amount, rebuys, buyin) VALUES (?, ?, ?, ?, ?)",
+        (date, winner, amount, sum(r[2] for r in results), buyin_val)
+    ).lastrowid
+    db.executemany(
+        "INSERT INTO game_players (game_id, username, buyin, rebuys, cashout, net) VALUES (?, ?, ?, ?, ?, ?)",
+        [(game_id, username, buyin_val, rebuys, cash, net) for username, cash, rebuys, net in results]
+    )
+    ledger.apply_balances(db, [(username, net) for username, _, _, net in results])
+    db.commit()
+
+
+def forms(names, games, buyin, rng):
+    for _ in range(games):
+        form = {}
+        for username in names:
+            rebuys = rng.choice((0, 0, 1, 2))
+            form[f"play_{username}"] = "on"
+            form[f"amount_{username}"] = str(rng.randint(0, buyin * (1 + rebuys)))
+            form[f"rebuys_{username}"] = str(rebuys)
+        yield form
+
+
+def run(label, write, names, games):
+    rng = random.Random(2)
+    statements = []
+    samples = []
+    with database.get_db() as conn:
+        counting = _Counting(conn)
+        conn.set_trace_callback(statements.append)
+        for form in forms(names, games, 100, rng):
+            duration, _ = _bench.timed(write, counting, "2026-01-15", 100, form)
+            samples.append(duration)
+        conn.set_trace_callback(None)
+    print(
+        f"{label}: {counting.calls // games} calls, "
+        f"{len(statements) // games} statements per game"
+    )
+    _bench.report(label, samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--players", type=int, default=40)
+    parser.add_argument("--games", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    from routers import games
+
+    database.init_db()
+    with database.get_db() as conn:
+        names = _bench.seed(conn, players=args.players, rows=20_000, per_game=args.players)
+
+    run("per-row", per_row, names, args.games)
+    run("batched", batched, names, args.games)
+    run("add_game", games._save_game, names, args.games)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,85 @@
+"""
+Per-route latency with and without the game_players/games lookup indexes.
+
+Seeds 500k game_players rows into a scratch database, then requests every
+read route ROUNDS times through the app, once with the indexes init_db
+creates and once after dropping them. Page and summary caches are off so
+every request reaches SQLite.
+
+    python scripts/bench_indexes.py [--rows 500000] [--rounds 50]
+"""
+import argparse
+import os
+import random
+
+os.environ.setdefault("PAGE_CACHE_TTL", "0")
+os.environ.setdefault("SUMMARY_CACHE_TTL", "0")
+
+import _bench
+
+import db as database
+
+INDEXES = (
+    "idx_game_players_username_game",
+    "idx_game_players_game",
+    "idx_games_winner_amount",
+    "idx_games_date",
+)
+
+
+def routes(names, games, rng):
+    """(label, path factory) for every read route that filters game_players."""
+    return (
+        ("/dashboard", lambda: "/dashboard"),
+        ("/player/{username}", lambda: f"/player/{rng.choice(names)}"),
+        ("/history", lambda: "/history"),
+        ("/history/{game_id}", lambda: f"/history/{rng.randint(1, games)}"),
+        ("/leaderboard", lambda: "/leaderboard"),
+        ("/stats", lambda: "/stats"),
+    )
+
+
+def run(client, names, games, rounds):
+    rng = random.Random(1)
+    for label, path in routes(names, games, rng):
+        samples = []
+        for _ in range(rounds):
+            duration, response = _bench.timed(client.get, path())
+            assert response.status_code == 200, (label, response.status_code)
+            samples.append(duration)
+        _bench.report(label, samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--players", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    from fastapi.testclient import TestClient
+    import main as app_main
+
+    with database.get_db() as conn:
+        duration, names = _bench.timed(_bench.seed, conn, args.players, args.rows)
+        conn.execute("ANALYZE")
+    games = args.rows // 10
+    print(f"[bench] Seeded {args.rows} game_players rows ({games} games) in {duration:.1f}s")
+
+    with TestClient(app_main.app) as client:
+        assert _bench.login(client, names[0]).status_code == 302
+
+        print("\n-- with indexes")
+        run(client, names, games, args.rounds)
+
+        with database.get_db() as conn:
+            for name in INDEXES:
+                conn.execute(f"DROP INDEX {name}")
+            conn.execute("ANALYZE")
+        print("\n-- without " + ", ".join(INDEXES))
+        run(client, names, games, args.rounds)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
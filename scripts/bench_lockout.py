@@ -0,0 +1,94 @@
+"""
+Simulated password spray against the login lockout.
+
+ATTEMPTS failed logins from IPS addresses, cycling through USERNAMES
+usernames, go through a LockoutTracker with the configured limits exactly
+the way routers/auth.login uses it: retry_after() first, and only attempts
+that pass it reach the password check and record() their failure.
+
+Reports the tracker's own time, how many attempts reached bcrypt, and the
+bcrypt time that saves, from the median of a sample of real pwd.verify
+calls (--full verifies every admitted attempt instead). Also times the
+startup rebuild from an auth_log holding the same attempts.
+
+    python scripts/bench_lockout.py [--attempts 10000] [--ips 20] [--usernames 5000]
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+import _bench
+
+import db as database
+from config import LOCKOUT_WINDOW, LOCKOUT_USER_FAILURES, LOCKOUT_IP_FAILURES, LOCKOUT_MAX_KEYS
+from lockout import LockoutTracker
+
+
+def spray(attempts, ips, usernames):
+    for i in range(attempts):
+        yield f"203.0.113.{i % ips}", f"user{i % usernames}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--attempts", type=int, default=10_000)
+    parser.add_argument("--ips", type=int, default=20)
+    parser.add_argument("--usernames", type=int, default=5_000)
+    parser.add_argument("--samples", type=int, default=10)
+    parser.add_argument("--full", action="store_true", help="run bcrypt for every admitted attempt")
+    args = parser.parse_args(argv)
+
+    from passwords import pwd
+
+    stored = pwd.hash(_bench.PASSWORD)
+    verify_times = [_bench.timed(pwd.verify, "wrong-password", stored)[0] for _ in range(args.samples)]
+    verify = statistics.median(verify_times)
+
+    tracker = LockoutTracker(LOCKOUT_WINDOW, LOCKOUT_USER_FAILURES, LOCKOUT_IP_FAILURES, LOCKOUT_MAX_KEYS)
+    admitted = []
+    tracker_time = 0.0
+    now = time.time()
+    for ip, username in spray(args.attempts, args.ips, args.usernames):
+        start = time.perf_counter()
+        locked = tracker.retry_after(username, ip, now)
+        if not locked:
+            tracker.record(username, ip, False, now)
+        tracker_time += time.perf_counter() - start
+        if not locked:
+            admitted.append(username)
+
+    bcrypt_time = len(admitted) * verify
+    if args.full:
+        bcrypt_time = sum(_bench.timed(pwd.verify, "wrong-password", stored)[0] for _ in admitted)
+
+    print(
+        f"limits: {LOCKOUT_USER_FAILURES} failures/username, {LOCKOUT_IP_FAILURES}/IP "
+        f"per {LOCKOUT_WINDOW:.0f}s"
+    )
+    print(f"{args.attempts} attempts from {args.ips} IPs across {args.usernames} usernames")
+    print(f"  tracker time          {tracker_time * 1000:10.1f} ms  ({tracker_time / args.attempts * 1e6:.1f} us/attempt)")
+    print(f"  reached bcrypt        {len(admitted):10d}")
+    print(f"  rejected before it    {tracker.rejected:10d}")
+    print(f"  pwd.verify            {verify * 1000:10.1f} ms  (median of {args.samples})")
+    print(f"  bcrypt, no lockout    {args.attempts * verify:10.1f} s{' (estimated)' if not args.full else ''}")
+    print(f"  bcrypt, with lockout  {bcrypt_time:10.1f} s{' (estimated)' if not args.full else ''}")
+
+    database.init_db()
+    stamp = datetime.now(timezone.utc).replace(tzinfo=None)
+    with database.get_db() as conn:
+        conn.executemany(
+            "INSERT INTO auth_log (username, success, ip_address, timestamp) VALUES (?, 0, ?, ?)",
+            [
+                (username, ip, (stamp - timedelta(milliseconds=args.attempts - i)).isoformat())
+                for i, (ip, username) in enumerate(spray(args.attempts, args.ips, args.usernames))
+            ]
+        )
+        conn.commit()
+        duration, rows = _bench.timed(tracker.rebuild, conn)
+    print(f"  rebuild from auth_log {duration * 1000:10.1f} ms  ({rows} rows)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,85 @@
+"""
+Dashboard latency while logins are in flight.
+
+Starts the app under uvicorn, polls /dashboard from a logged-in session
+for a few seconds on its own, then again while LOGINS clients log in back
+to back. Each login comes from a fresh X-Forwarded-For address, so the
+per-IP rate limit never answers in place of bcrypt.
+
+    python scripts/bench_login_load.py [--logins 20] [--seconds 5]
+"""
+import argparse
+import itertools
+import threading
+import time
+
+import _bench
+
+import db as database
+
+
+def poll(client, url, seconds):
+    samples = []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        duration, response = _bench.timed(client.get, url + "/dashboard")
+        assert response.status_code == 200, response.status_code
+        samples.append(duration)
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args(argv)
+
+    import httpx
+
+    database.init_db()
+    with database.get_db() as conn:
+        names = _bench.seed(conn, players=args.logins + 1, rows=2_000)
+
+    addresses = (f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in itertools.count(1))
+    lock = threading.Lock()
+    stop = threading.Event()
+    logins = []
+
+    def log_in_repeatedly(username):
+        with httpx.Client(base_url=url, timeout=60) as client:
+            while not stop.is_set():
+                with lock:
+                    headers = {"X-Forwarded-For": next(addresses)}
+                duration, response = _bench.timed(
+                    lambda: _bench.login(client, username, headers=headers)
+                )
+                assert response.status_code == 302, response.status_code
+                logins.append(duration)
+                client.cookies.clear()
+
+    with _bench.serve() as url, httpx.Client(base_url=url, timeout=60) as viewer:
+        assert _bench.login(viewer, names[0]).status_code == 302
+
+        idle = poll(viewer, url, args.seconds)
+
+        threads = [
+            threading.Thread(target=log_in_repeatedly, args=(name,))
+            for name in names[1:args.logins + 1]
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(1)  # let every client get a login in flight
+        busy = poll(viewer, url, args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    print()
+    _bench.report("/dashboard, idle", idle)
+    _bench.report(f"/dashboard, {args.logins} logins in flight", busy)
+    _bench.report("login (GET form + POST)", logins)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
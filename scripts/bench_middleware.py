@@ -0,0 +1,134 @@
+"""
+Requests/sec through the old BaseHTTPMiddleware stack and AppMiddleware.
+
+"old" rebuilds the previous stack around the same app: InitialPassword,
+Session, SlowAPI, NoCache and SecurityHeaders middleware, the first three
+as they were in main.py and security.py. "new" is the stack main.py
+installs. Requests go straight into the ASGI app on one event loop
+(httpx.ASGITransport), so the numbers are app + middleware cost without
+sockets, from CONCURRENCY clients at once.
+
+    python scripts/bench_middleware.py [--seconds 5] [--concurrency 10]
+"""
+import argparse
+import asyncio
+import time
+
+import _bench
+
+from fastapi import Request
+from fastapi.responses import RedirectResponse
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.middleware.sessions import SessionMiddleware
+
+from security import SECURITY_HEADERS
+
+PATHS = ("/static/images/green-poker-chip.png", "/login")
+
+
+class InitialPasswordMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        if (
+            request.session.get("user") and
+            request.session.get("must_set_password") and
+            not request.url.path.startswith(("/login", "/set-password", "/static", "/logout"))
+        ):
+            return RedirectResponse("/set-password", 302)
+        return await call_next(request)
+
+
+class NoCacheMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        protected = ["/dashboard","/profile","/leaderboard","/player/","/monthly-stats","/global-stats","/history","/admin"]
+        if any(request.url.path.startswith(p) for p in protected):
+            response.headers.update({
+                "Cache-Control": "no-store, no-cache, must-revalidate, proxy-revalidate",
+                "Pragma": "no-cache",
+                "Expires": "0",
+                "Surrogate-Control": "no-store"
+            })
+        return response
+
+
+class SecurityHeadersMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        response.headers.update(SECURITY_HEADERS)
+        return response
+
+
+def use_stack(app, middleware):
+    """Swap the app's middleware list; Starlette rebuilds the stack on the next call."""
+    app.user_middleware = list(middleware)
+    app.middleware_stack = None
+
+
+def old_stack(app, session):
+    from slowapi.middleware import SlowAPIMiddleware
+    from rate_limit import limiter
+
+    app.state.limiter = limiter
+    # user_middleware is outermost first: the reverse of add_middleware order
+    return [
+        Middleware(SecurityHeadersMiddleware),
+        Middleware(NoCacheMiddleware),
+        Middleware(SlowAPIMiddleware),
+        session,
+        Middleware(InitialPasswordMiddleware),
+    ]
+
+
+async def throughput(app, path, seconds, concurrency):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(20):  # warm up templates and the file stat cache
+            assert (await client.get(path)).status_code == 200
+        count = 0
+        deadline = time.perf_counter() + seconds
+
+        async def worker():
+            nonlocal count
+            while time.perf_counter() < deadline:
+                response = await client.get(path)
+                assert response.status_code == 200, response.status_code
+                count += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return count / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    import main as app_main
+
+    app = app_main.app
+    new = list(app.user_middleware)
+    session = next(m for m in new if m.cls is SessionMiddleware)
+    stacks = (("old", old_stack(app, session)), ("new", new))
+
+    results = {}
+    for path in PATHS:
+        for name, middleware in stacks:
+            use_stack(app, middleware)
+            results[path, name] = asyncio.run(
+                throughput(app, path, args.seconds, args.concurrency)
+            )
+
+    print()
+    for path in PATHS:
+        old, new_rps = results[path, "old"], results[path, "new"]
+        print(f"{path:<40} old {old:8.0f} req/s   new {new_rps:8.0f} req/s   x{new_rps / old:.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,106 @@
+"""
+Cold start and first /stats request, with and without template precompile.
+
+Each run is a fresh interpreter that imports main, runs the startup hooks,
+logs in and times its first GET /stats. Four setups, RUNS times each:
+
+- precompile off, cold bytecode cache: stats.html is parsed and compiled
+  on the first request, which is what every worker did before templating.py
+- precompile off, warm cache: compiled code comes from TEMPLATE_CACHE_DIR
+- precompile on, cold cache: startup compiles every template
+- precompile on, warm cache: the Docker image case (`python templating.py`
+  at build time)
+
+    python scripts/bench_templates.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+import _bench
+
+import db as database
+
+
+def child():
+    """Runs in the fresh interpreter; prints its timings as JSON."""
+    start = time.perf_counter()
+    import main
+    imported = time.perf_counter()
+
+    from fastapi.testclient import TestClient
+
+    with TestClient(main.app) as client:
+        started = time.perf_counter()
+        # every run logs in from the same address; keep under 5/minute
+        with database.get_db() as conn:
+            conn.execute("DELETE FROM rate_limits")
+        assert _bench.login(client, "player0").status_code == 302
+        first_start = time.perf_counter()
+        assert client.get("/stats").status_code == 200
+        first = time.perf_counter() - first_start
+        second_start = time.perf_counter()
+        client.get("/stats")
+        second = time.perf_counter() - second_start
+    print(json.dumps({
+        "import": imported - start,
+        "startup": started - imported,
+        "first": first,
+        "second": second,
+    }))
+
+
+def run(precompile: bool, warm: bool, runs: int):
+    cache_dir = os.path.join(_bench.TMP, "jinja-bench")
+    env = {
+        **os.environ,
+        "TEMPLATE_CACHE_DIR": cache_dir,
+        "TEMPLATE_PRECOMPILE": "1" if precompile else "0",
+        "PAGE_CACHE_TTL": "0",
+    }
+    results = []
+    for _ in range(runs):
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        if warm:
+            subprocess.run([sys.executable, "templating.py"], cwd=_bench.ROOT, env=env,
+                           check=True, stdout=subprocess.DEVNULL)
+        proc = subprocess.run([sys.executable, __file__, "--child"], env=env,
+                              capture_output=True, text=True)
+        if proc.returncode:
+            raise SystemExit(proc.stderr)
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return {key: statistics.median(r[key] for r in results) for key in results[0]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        child()
+        return 0
+
+    database.init_db()
+    with database.get_db() as conn:
+        _bench.seed(conn, players=50, rows=20_000)
+
+    print(f"{'':<28}{'import main':>12}{'startup':>10}{'1st /stats':>12}{'2nd /stats':>12}   (median ms)")
+    for precompile in (False, True):
+        for warm in (False, True):
+            t = run(precompile, warm, args.runs)
+            label = f"precompile {'on' if precompile else 'off'}, {'warm' if warm else 'cold'} cache"
+            print(
+                f"{label:<28}{t['import'] * 1000:12.1f}{t['startup'] * 1000:10.1f}"
+                f"{t['first'] * 1000:12.1f}{t['second'] * 1000:12.1f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,92 @@
+"""
+Load test: one uvicorn worker against several.
+
+For each worker count the app runs under uvicorn with the session secret
+left to the persisted file, then:
+
+- checks the state that has to be shared: a session cookie from one login
+  is accepted on every request, and the sixth login attempt a minute from
+  one address gets 429 whichever worker serves it;
+- drives CONCURRENCY clients at GET /login and GET /player/{username} for
+  SECONDS each and reports req/s, p50 and p99.
+
+Extra workers only help with cores to run them on; the script prints the
+core count next to the results.
+
+    python scripts/bench_workers.py [--workers 1 4] [--seconds 10] [--concurrency 32]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import _bench
+
+import db as database
+
+
+def check_shared_state(url, names):
+    import httpx
+
+    with httpx.Client(base_url=url, timeout=60) as client:
+        assert _bench.login(client, names[0]).status_code == 302
+        for _ in range(20):
+            response = client.get("/dashboard", follow_redirects=False)
+            assert response.status_code == 200, "session rejected by a worker"
+
+    headers = {"X-Forwarded-For": "192.0.2.1"}
+    with httpx.Client(base_url=url, timeout=60) as client:
+        codes = [
+            _bench.login(client, names[1], "wrong-password", headers=headers).status_code
+            for _ in range(6)
+        ]
+    assert codes[-1] == 429 and 429 not in codes[:5], codes
+
+
+async def load(url, path, seconds, concurrency):
+    import httpx
+
+    samples = []
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + seconds
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await client.get(path)
+                samples.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.status_code
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return samples, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args(argv)
+
+    database.init_db()
+    with database.get_db() as conn:
+        names = _bench.seed(conn, players=200, rows=100_000)
+
+    print(f"[bench] {os.cpu_count()} cores")
+    for workers in args.workers:
+        with _bench.serve(workers=workers, SESSION_SECRET="") as url:
+            check_shared_state(url, names)
+            print(f"\n-- {workers} worker(s): sessions and rate limits shared")
+            for path in ("/login", f"/player/{names[2]}"):
+                samples, elapsed = asyncio.run(load(url, path, args.seconds, args.concurrency))
+                print(f"{path:<20} {len(samples) / elapsed:8.0f} req/s")
+                _bench.report(f"  {path}", samples)
+        with database.get_db() as conn:
+            conn.execute("DELETE FROM rate_limits")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
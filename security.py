@@ -1,22 +1,53 @@
-from starlette.middleware.base import BaseHTTPMiddleware
+import os
+import secrets
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        response = await call_next(request)
-        # Apply common security headers
-        response.headers.update({
-            "Strict-Transport-Security": "max-age=63072000; includeSubDomains; preload",
-            "X-Content-Type-Options": "nosniff",
-            "X-Frame-Options": "DENY",
-            "Referrer-Policy": "no-referrer-when-downgrade",
-            "Content-Security-Policy": (
-                "default-src 'self'; "
-                "script-src 'self' 'unsafe-inline' https://cdn.tailwindcss.com https://cdn.jsdelivr.net; "
-                "style-src 'self' 'unsafe-inline'; "
-                "img-src 'self' data:; "
-                "object-src 'none'; "
-                "frame-ancestors 'none'; "
-                "base-uri 'self';"
-            )
-        })
-        return response
+from config import SESSION_SECRET, SESSION_SECRET_FILE
+
+# Common security headers, added to every response by middleware.AppMiddleware
+SECURITY_HEADERS = {
+    "Strict-Transport-Security": "max-age=63072000; includeSubDomains; preload",
+    "X-Content-Type-Options": "nosniff",
+    "X-Frame-Options": "DENY",
+    "Referrer-Policy": "no-referrer-when-downgrade",
+    "Content-Security-Policy": (
+        "default-src 'self'; "
+        "script-src 'self' 'unsafe-inline' https://cdn.tailwindcss.com https://cdn.jsdelivr.net; "
+        "style-src 'self' 'unsafe-inline'; "
+        "img-src 'self' data:; "
+        "object-src 'none'; "
+        "frame-ancestors 'none'; "
+        "base-uri 'self';"
+    )
+}
+
+
+def _persisted_secret(path: str) -> str:
+    """
+    Read the session secret from `path`, creating it on first use. The file
+    is written under a temporary name and hard-linked into place, so when
+    several workers start at once exactly one secret wins and every worker
+    reads a complete file.
+    """
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(secrets.token_hex(32))
+    try:
+        os.link(tmp, path)
+    except FileExistsError:
+        pass
+    finally:
+        os.unlink(tmp)
+    with open(path) as f:
+        return f.read().strip()
+
+
+def session_secret() -> str:
+    """SESSION_SECRET if set, else the secret in SESSION_SECRET_FILE (created on first call)."""
+    return SESSION_SECRET or _persisted_secret(SESSION_SECRET_FILE)
@@ -0,0 +1,129 @@
+"""
+Award computation shared by the stats pages.
+
+`compute_awards` walks the per-player totals once and tracks every award and
+top-N list at the same time, instead of calling max()/min() over the player
+dict once per award. Ties resolve to the first player seen, which matches
+what the previous max()/min() calls did.
+"""
+import heapq
+
+MONTH = "month"
+ALL_TIME = "all"
+
+TOP_EARNERS = 5
+TOP_THREE = 3
+CONSISTENT_MIN_GAMES = 3
+COMEBACK_MIN_REBUYS = 2
+
+
+def roi(totals) -> float:
+    """Return on investment in percent, rounded the way the pages show it."""
+    if totals["invested"] > 0:
+        return round(totals["net"] / totals["invested"] * 100, 2)
+    return 0
+
+
+def potm_score(totals) -> float:
+    """Player of the Month score."""
+    return (
+        totals["net"]
+        + roi(totals) * 2
+        + totals["games"] * 5
+        - totals["rebuys"] * 2
+    )
+
+
+class _TopN:
+    """Bounded min-heap keeping the n largest keys; earlier entries win ties."""
+
+    def __init__(self, n):
+        self.n = n
+        self.heap = []
+
+    def push(self, key, index, item):
+        entry = (key, -index, item)
+        if len(self.heap) < self.n:
+            heapq.heappush(self.heap, entry)
+        elif entry > self.heap[0]:
+            heapq.heapreplace(self.heap, entry)
+
+    def items(self):
+        return [entry[2] for entry in sorted(self.heap, reverse=True)]
+
+
+def compute_awards(rows, scope: str) -> dict:
+    """
+    Compute every award for one scope in a single pass.
+
+    `rows` maps username -> totals as returned by aggregates.load_period.
+    `scope` is MONTH or ALL_TIME; only MONTH scores Player of the Month.
+    Award holders default to "N/A" when nobody qualifies.
+    """
+    top_earner = top_loser = top_rebuyer = most_games = worst = None
+    best_roi = consistent = comeback = potm = None
+    earners = _TopN(TOP_EARNERS)
+    podium = _TopN(TOP_THREE)
+    want_potm = scope == MONTH
+
+    for index, (username, v) in enumerate(rows.items()):
+        if top_earner is None or v["net"] > top_earner[1]:
+            top_earner = (username, v["net"])
+        if top_loser is None or v["net"] < top_loser[1]:
+            top_loser = (username, v["net"])
+        if top_rebuyer is None or v["rebuys"] > top_rebuyer[1]:
+            top_rebuyer = (username, v["rebuys"])
+        if most_games is None or v["games"] > most_games[1]:
+            most_games = (username, v["games"])
+        if worst is None or v["worst"] < worst[1]:
+            worst = (username, v["worst"])
+        if v["invested"] > 0:
+            r = roi(v)
+            if best_roi is None or r > best_roi[1]:
+                best_roi = (username, r)
+        if v["games"] >= CONSISTENT_MIN_GAMES:
+            spread = abs(v["net"])
+            if consistent is None or spread < consistent[1]:
+                consistent = (username, spread)
+        if v["net"] > 0 and v["rebuys"] >= COMEBACK_MIN_REBUYS:
+            if comeback is None or v["net"] > comeback[1]:
+                comeback = (username, v["net"])
+        earners.push(v["net"], index, (username, v))
+        if want_potm:
+            score = potm_score(v)
+            if potm is None or score > potm[1]:
+                potm = (username, score)
+            podium.push(score, index, (username, v))
+
+    top_earner = top_earner or ("N/A", 0)
+    top_loser = top_loser or ("N/A", 0)
+    top_rebuyer = top_rebuyer or ("N/A", 0)
+    most_games = most_games or ("N/A", 0)
+    worst = worst or ("N/A", 0)
+    best_roi = best_roi or ("N/A", 0)
+    consistent = consistent or ("N/A", 0)
+    comeback = comeback or ("N/A", 0)
+
+    awards = {
+        "top_earner": top_earner[0],
+        "top_earner_amount": top_earner[1],
+        "top_loser": top_loser[0],
+        "top_loser_amount": top_loser[1],
+        "top_rebuyer": top_rebuyer[0],
+        "total_rebuys": top_rebuyer[1],
+        "best_roi": best_roi[1],
+        "roi_user": best_roi[0],
+        "most_consistent_user": consistent[0],
+        "consistent_user_avg": consistent[1],
+        "comeback_user": comeback[0],
+        "comeback_net": comeback[1],
+        "most_games_user": most_games[0],
+        "most_games_count": most_games[1],
+        "worst_loser": worst[0],
+        "worst_loss": worst[1] or 0,
+        "top_earners": earners.items(),
+    }
+    if want_potm:
+        awards["player_of_month"] = potm[0] if potm else "N/A"
+        awards["top_three"] = podium.items()
+    return awards
@@ -0,0 +1,50 @@
+"""
+The one Jinja2 environment shared by every router.
+
+Templates are parsed and compiled once per process instead of once per
+router module. Compiled bytecode is also written to a FileSystemBytecodeCache,
+so a fresh worker (or a restart) skips the compile step, and
+`python templating.py` precompiles everything ahead of time, e.g. while
+building the Docker image. auto_reload is off unless TEMPLATE_AUTO_RELOAD=1,
+so production never stats template files on each render.
+"""
+import sys
+from pathlib import Path
+
+import jinja2
+from fastapi.templating import Jinja2Templates
+
+from config import TEMPLATE_AUTO_RELOAD, TEMPLATE_CACHE_DIR
+
+TEMPLATES_DIR = Path(__file__).resolve().parent / "templates"
+
+
+def _bytecode_cache():
+    if TEMPLATE_CACHE_DIR:
+        Path(TEMPLATE_CACHE_DIR).mkdir(parents=True, exist_ok=True)
+        return jinja2.FileSystemBytecodeCache(TEMPLATE_CACHE_DIR)
+    # default: a per-user directory under the system temp dir
+    return jinja2.FileSystemBytecodeCache()
+
+
+env = jinja2.Environment(
+    loader=jinja2.FileSystemLoader(TEMPLATES_DIR),
+    autoescape=True,
+    auto_reload=TEMPLATE_AUTO_RELOAD,
+    bytecode_cache=_bytecode_cache(),
+)
+
+templates = Jinja2Templates(env=env)
+
+
+def precompile() -> int:
+    """Load every template once, filling the in-memory and bytecode caches."""
+    names = env.list_templates(extensions=["html"])
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+
+if __name__ == "__main__":
+    print(f"[templates] Precompiled {precompile()} templates.")
+    sys.exit(0)
@@ -0,0 +1,112 @@
+"""
+Shared fixtures.
+
+The whole session runs against one throwaway database. DATABASE_URL (and the
+other paths derived from it) must be set before config is first imported,
+so this happens at module level, ahead of any app import.
+"""
+import os
+import queue
+import re
+import sys
+import tempfile
+from datetime import date, timedelta
+
+_TMP = tempfile.mkdtemp(prefix="poker-tests-")
+os.environ["DATABASE_URL"] = os.path.join(_TMP, "poker.db")
+os.environ["TEMPLATE_CACHE_DIR"] = os.path.join(_TMP, "jinja")
+os.environ.setdefault("SESSION_SECRET", "test-session-secret")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import db as database
+import ledger
+
+PLAYERS = ("alice", "bob", "carol", "dave")
+
+
+def _seed(conn):
+    for username in PLAYERS:
+        conn.execute(
+            "INSERT INTO players (username, password, avatar_path) VALUES (?, '', ?)",
+            (username, f"/static/avatars/{username}.png")
+        )
+    # Two games a month for the current and the three previous months
+    first = date.today().replace(day=1)
+    days = []
+    for _ in range(4):
+        days += [first, first + timedelta(days=1)]
+        first = (first - timedelta(days=1)).replace(day=1)
+    for i, day in enumerate(days):
+        a, b, c, d = PLAYERS[i % 4:] + PLAYERS[:i % 4]
+        ledger.insert_game(conn, day.isoformat(), 100, [
+            (a, 250 + 10 * i, 1), (b, 100, 0), (c, 50, 0), (d, 0, 0),
+        ])
+    conn.commit()
+
+
+@pytest.fixture(scope="session")
+def seeded_db():
+    database.init_db()
+    with database.get_db() as conn:
+        _seed(conn)
+
+
+def _drain_pool():
+    while True:
+        try:
+            database._pool.get_nowait().close()
+        except queue.Empty:
+            return
+
+
+@pytest.fixture
+def statements(seeded_db, monkeypatch):
+    """
+    SQL of every statement run through get_db()/run_db() during the test,
+    with parameters inlined.
+    """
+    log = []
+    connect = database._connect
+
+    def traced():
+        conn = connect()
+        conn.set_trace_callback(log.append)
+        return conn
+
+    # Idle pooled connections would bypass the trace
+    _drain_pool()
+    monkeypatch.setattr(database, "_connect", traced)
+    yield log
+    _drain_pool()
+
+
+@pytest.fixture
+def client(statements):
+    """A TestClient logged in as alice (admin), with the app's startup hooks run."""
+    from fastapi.testclient import TestClient
+
+    import main
+    from deps import invalidate_user
+    from passwords import pwd
+
+    with database.get_db() as conn:
+        conn.execute(
+            "UPDATE players SET password = ?, is_admin = 1, must_set_password = 0 WHERE username = ?",
+            (pwd.hash("secret123"), "alice")
+        )
+        # every test logs in; don't let them share the 5/minute login limit
+        conn.execute("DELETE FROM rate_limits")
+    invalidate_user("alice")
+
+    with TestClient(main.app) as client:
+        page = client.get("/login")
+        token = re.search(r'name="csrf_token" value="([^"]+)"', page.text).group(1)
+        response = client.post(
+            "/login",
+            data={"username": "alice", "password": "secret123", "csrf_token": token},
+            follow_redirects=False,
+        )
+        assert response.headers["location"] == "/dashboard"
+        yield client
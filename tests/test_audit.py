@@ -0,0 +1,53 @@
+"""
+The buffered audit writer must not lose rows to a briefly locked database.
+"""
+import sqlite3
+
+import audit
+import db as database
+
+
+def _count(actor):
+    with database.get_db() as conn:
+        return conn.execute("SELECT COUNT(*) FROM admin_log WHERE actor = ?", (actor,)).fetchone()[0]
+
+
+def _row(actor, n):
+    return ("admin_log", (actor, f"action {n}", None, None, "2024-01-01 00:00:00"))
+
+
+def test_locked_batch_is_retried(seeded_db, monkeypatch):
+    writer = audit.AuditWriter(100, 50, 0.01)
+    insert = writer._insert
+    failures = iter([sqlite3.OperationalError("database is locked")] * 2)
+
+    def flaky(batch):
+        error = next(failures, None)
+        if error:
+            raise error
+        insert(batch)
+
+    monkeypatch.setattr(writer, "_insert", flaky)
+    monkeypatch.setattr(audit, "AUDIT_RETRY_DELAY", 0.01)
+    writer.start()
+    for n in range(20):
+        writer.submit(*_row("retry", n))
+    writer.stop()
+
+    assert _count("retry") == 20
+    assert writer.retries == 2
+    assert writer.failed == 0
+
+
+def test_bad_row_does_not_drop_its_batch(seeded_db):
+    writer = audit.AuditWriter(100, 50, 0.01)
+    writer.start()
+    for n in range(5):
+        writer.submit(*_row("isolate", n))
+    writer.submit("admin_log", ("isolate", "too few columns"))
+    for n in range(5, 10):
+        writer.submit(*_row("isolate", n))
+    writer.stop()
+
+    assert _count("isolate") == 10
+    assert writer.failed == 1
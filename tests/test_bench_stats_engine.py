@@ -0,0 +1,126 @@
+"""
+Benchmark: compute_awards against the per-award max()/min() calls it replaced.
+
+Skipped by default; run with
+
+    BENCH=1 python -m pytest -q -s tests/test_bench_stats_engine.py
+
+The totals come from 100k synthetic game_players rows, aggregated the way
+aggregates.load_period returns them. A "pass" is one walk over the player
+dict, counted through items().
+"""
+import os
+import random
+import time
+
+import pytest
+
+import stats_engine
+
+pytestmark = pytest.mark.skipif(
+    not os.getenv("BENCH"), reason="benchmark; set BENCH=1 to run"
+)
+
+ROWS = 100_000
+PLAYERS = 5_000
+GAMES = ROWS // 20
+
+
+class _CountingDict(dict):
+    passes = 0
+
+    def items(self):
+        self.passes += 1
+        return super().items()
+
+
+def _totals(seed=0):
+    rng = random.Random(seed)
+    players = [f"player{i}" for i in range(PLAYERS)]
+    totals = _CountingDict()
+    for game_id in range(GAMES):
+        for username in rng.sample(players, ROWS // GAMES):
+            buyin = rng.choice((20, 50, 100))
+            rebuys = rng.choice((0, 0, 0, 1, 2, 3))
+            net = rng.randint(-buyin * (rebuys + 1), buyin * 4)
+            v = totals.setdefault(username, {
+                "net": 0, "invested": 0, "rebuys": 0, "games": 0,
+                "wins": 0, "best": net, "worst": net,
+            })
+            v["net"] += net
+            v["invested"] += buyin * (rebuys + 1)
+            v["rebuys"] += rebuys
+            v["games"] += 1
+            v["best"] = max(v["best"], net)
+            v["worst"] = min(v["worst"], net)
+    return totals
+
+
+def _per_award(rows, scope):
+    """The pre-stats_engine shape: one max()/min() over rows.items() per value."""
+    roi = stats_engine.roi
+    awards = {
+        "top_earner": max(rows.items(), key=lambda x: x[1]["net"], default=("N/A", {}))[0],
+        "top_earner_amount": max(rows.items(), key=lambda x: x[1]["net"], default=("", {"net": 0}))[1]["net"],
+        "top_loser": min(rows.items(), key=lambda x: x[1]["net"], default=("N/A", {}))[0],
+        "top_loser_amount": min(rows.items(), key=lambda x: x[1]["net"], default=("", {"net": 0}))[1]["net"],
+        "top_rebuyer": max(rows.items(), key=lambda x: x[1]["rebuys"], default=("N/A", {}))[0],
+        "total_rebuys": max(rows.items(), key=lambda x: x[1]["rebuys"], default=("", {"rebuys": 0}))[1]["rebuys"],
+        "best_roi": max(
+            ((u, roi(v)) for u, v in rows.items() if v["invested"] > 0),
+            key=lambda x: x[1], default=("N/A", 0)
+        )[1],
+        "roi_user": max(
+            ((u, roi(v)) for u, v in rows.items() if v["invested"] > 0),
+            key=lambda x: x[1], default=("N/A", 0)
+        )[0],
+        "most_consistent_user": min(
+            ((u, abs(v["net"])) for u, v in rows.items() if v["games"] >= 3),
+            key=lambda x: x[1], default=("N/A", 0)
+        )[0],
+        "consistent_user_avg": min(
+            ((u, abs(v["net"])) for u, v in rows.items() if v["games"] >= 3),
+            key=lambda x: x[1], default=("N/A", 0)
+        )[1],
+        "comeback_user": max(
+            ((u, v) for u, v in rows.items() if v["net"] > 0 and v["rebuys"] >= 2),
+            key=lambda x: x[1]["net"], default=("N/A", {"net": 0})
+        )[0],
+        "most_games_user": max(rows.items(), key=lambda x: x[1]["games"], default=("N/A", {}))[0],
+        "most_games_count": max(rows.items(), key=lambda x: x[1]["games"], default=("", {"games": 0}))[1]["games"],
+        "worst_loser": min(rows.items(), key=lambda x: x[1]["worst"], default=("N/A", {}))[0],
+        "top_earners": sorted(rows.items(), key=lambda x: x[1]["net"], reverse=True)[:5],
+    }
+    if scope == stats_engine.MONTH:
+        key = lambda x: stats_engine.potm_score(x[1])
+        awards["player_of_month"] = max(rows.items(), key=key, default=("N/A", {}))[0]
+        awards["top_three"] = sorted(rows.items(), key=key, reverse=True)[:3]
+    return awards
+
+
+def _measure(fn, rows, scope, repeat=5):
+    rows.passes = 0
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(rows, scope)
+        best = min(best, time.perf_counter() - start)
+    return result, rows.passes // repeat, best
+
+
+@pytest.mark.parametrize("scope", [stats_engine.MONTH, stats_engine.ALL_TIME])
+def test_compute_awards_single_pass(scope):
+    rows = _totals()
+
+    old, old_passes, old_time = _measure(_per_award, rows, scope)
+    new, new_passes, new_time = _measure(stats_engine.compute_awards, rows, scope)
+
+    print(
+        f"\n[bench] {ROWS} rows / {len(rows)} players, scope={scope}: "
+        f"per-award {old_passes} passes {old_time * 1000:.1f} ms, "
+        f"compute_awards {new_passes} pass {new_time * 1000:.1f} ms"
+    )
+    for key in old:
+        assert new[key] == old[key], key
+    assert new_passes == 1
+    assert new_time < old_time
@@ -0,0 +1,46 @@
+"""
+Async handlers must never wait on the SQLite write lock on the event loop.
+"""
+import re
+import sqlite3
+import threading
+import time
+
+import config
+
+
+def _csrf_token(client):
+    page = client.get("/profile")
+    return re.search(r'name="csrf_token" value="([^"]+)"', page.text).group(1)
+
+
+def test_rate_limit_check_waits_for_the_write_lock_off_the_loop(client):
+    token = _csrf_token(client)
+    done = threading.Event()
+
+    def post_login():
+        client.post(
+            "/login",
+            data={"username": "nobody", "password": "wrong1234", "csrf_token": token},
+            follow_redirects=False,
+        )
+        done.set()
+
+    # Another writer (a game, an import batch, an audit flush) holds the lock
+    blocker = sqlite3.connect(config.DATABASE_URL, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    poster = threading.Thread(target=post_login)
+    try:
+        poster.start()
+        time.sleep(0.3)  # the POST is now waiting on its rate-limit counter
+        start = time.perf_counter()
+        client.get("/login", follow_redirects=False)
+        elapsed = time.perf_counter() - start
+        still_waiting = not done.is_set()
+    finally:
+        blocker.rollback()
+        blocker.close()
+        poster.join()
+
+    assert still_waiting
+    assert elapsed < 0.5
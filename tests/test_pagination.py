@@ -0,0 +1,30 @@
+"""
+Malformed paging parameters are a 400, never a 500.
+"""
+import pytest
+
+BAD_PAGES = ("0", "-1", "abc", "²", "1.5", "99999999999999999999999")
+
+
+@pytest.mark.parametrize("page", BAD_PAGES)
+def test_leaderboard_rejects_bad_page(client, page):
+    assert client.get("/leaderboard", params={"page": page}).status_code == 400
+
+
+def test_leaderboard_pages(client):
+    assert client.get("/leaderboard").status_code == 200
+    assert client.get("/leaderboard", params={"page": "2"}).status_code == 200
+
+
+@pytest.mark.parametrize("limit", ("0", "abc", "²"))
+def test_history_rejects_bad_limit(client, limit):
+    assert client.get("/history", params={"limit": limit}).status_code == 400
+
+
+def test_history_clamps_large_limit(client):
+    assert client.get("/history", params={"limit": "99999999999999999999999"}).status_code == 200
+
+
+@pytest.mark.parametrize("cursor", ("2024-01-01", "2024-01-01:x", "2024-01-01:²", "2024-01-01:99999999999999999999999"))
+def test_history_rejects_bad_cursor(client, cursor):
+    assert client.get("/history", params={"cursor": cursor}).status_code == 400
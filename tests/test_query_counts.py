@@ -0,0 +1,78 @@
+"""
+Query-count regressions: pages must not fall back to one query per player.
+"""
+import re
+from datetime import date, datetime
+
+import db as database
+import routers.global_stats as global_stats
+import routers.monthly_stats as monthly_stats
+import routers.stats as stats
+from deps import invalidate_user
+
+MONTH = date.today().strftime("%Y-%m")
+
+AVATAR_LOOKUP = re.compile(r"\bavatar_path\b.*\bFROM players\b", re.S | re.I)
+
+
+def _count(statements, pattern):
+    return sum(1 for sql in statements if pattern.search(sql))
+
+
+def _build(statements, build):
+    start = len(statements)
+    with database.get_db() as conn:
+        ctx = build(conn)
+    return ctx, statements[start:]
+
+
+def test_stats_context_resolves_avatars_in_one_query(statements):
+    ctx, sqls = _build(statements, lambda conn: stats._stats_context(conn, datetime.now()))
+    assert _count(sqls, AVATAR_LOOKUP) == 1
+    assert ctx["g"]["top_earner_avatar"]
+
+
+def test_global_stats_context_resolves_avatars_in_one_query(statements):
+    ctx, sqls = _build(statements, global_stats._global_stats_context)
+    assert _count(sqls, AVATAR_LOOKUP) == 1
+
+
+def test_monthly_stats_context_resolves_avatars_in_one_query(statements):
+    ctx, sqls = _build(
+        statements, lambda conn: monthly_stats._monthly_stats_context(conn, MONTH, False, 5)
+    )
+    assert _count(sqls, AVATAR_LOOKUP) == 1
+    assert ctx["monthly_ctx"]["player_of_month_avatar"]
+
+
+# ── current user: loaded at most once per request ───────────────────────
+USER_LOOKUP = re.compile(r"SELECT \* FROM players WHERE username = ", re.I)
+
+# Left out because they cannot render in this tree: /global-stats and
+# /monthly-stats pass stats.html a context it does not expect, and
+# add_game.html does not exist. The stats contexts are covered above.
+PROTECTED_ROUTES = (
+    "/dashboard",
+    "/stats",
+    "/leaderboard",
+    "/history",
+    "/profile",
+    "/player/bob",
+)
+
+
+def test_routes_load_current_user_at_most_once(client, statements):
+    invalidate_user("alice")
+    for route in PROTECTED_ROUTES:
+        start = len(statements)
+        response = client.get(route)
+        assert response.status_code == 200, route
+        assert _count(statements[start:], USER_LOOKUP) <= 1, route
+
+
+def test_cached_user_needs_no_query(client, statements):
+    client.get("/dashboard")
+    for route in PROTECTED_ROUTES:
+        start = len(statements)
+        client.get(route)
+        assert _count(statements[start:], USER_LOOKUP) == 0, route
@@ -0,0 +1,70 @@
+"""
+Every monthly query must find its rows through an index (games.month or
+the game_players indexes), never by scanning games. The admin panel reads
+the newest log rows straight off the timestamp indexes.
+"""
+import re
+from datetime import date, datetime
+
+import aggregates
+import db as database
+import potm
+import routers.monthly_stats as monthly_stats
+import routers.stats as stats
+
+MONTH = date.today().strftime("%Y-%m")
+
+
+def _monthly(sqls):
+    return [s for s in sqls if re.search(r"\bgames\b", s) and re.search(r"\bmonth\b", s)]
+
+
+def _games_scans(conn, sql):
+    """Plan lines that scan games, under its own name or an alias."""
+    names = {"games"} | set(re.findall(r"\bgames\s+(?:AS\s+)?(\w+)", sql, re.I))
+    names -= {"WHERE", "ON", "JOIN", "GROUP", "ORDER", "LIMIT", "LEFT", "INNER"}
+    plan = conn.execute("EXPLAIN QUERY PLAN " + sql).fetchall()
+    pattern = re.compile(r"SCAN ({})\b".format("|".join(map(re.escape, names))))
+    return [row["detail"] for row in plan if pattern.match(row["detail"])]
+
+
+def _assert_indexed(statements, run):
+    start = len(statements)
+    with database.get_db() as conn:
+        run(conn)
+        monthly = _monthly(statements[start:])
+        assert monthly, "no monthly query was captured"
+        for sql in monthly:
+            assert not _games_scans(conn, sql), sql
+
+
+def test_stats_page_monthly_queries_use_index(statements):
+    _assert_indexed(statements, lambda conn: stats._stats_context(conn, datetime.now()))
+
+
+def test_monthly_stats_page_queries_use_index(statements):
+    _assert_indexed(
+        statements, lambda conn: monthly_stats._monthly_stats_context(conn, MONTH, False, 5)
+    )
+
+
+def test_refresh_player_uses_index(statements):
+    _assert_indexed(
+        statements, lambda conn: aggregates.refresh_player(conn, "alice", f"{MONTH}-01")
+    )
+
+
+def test_pending_months_uses_index(statements):
+    _assert_indexed(statements, lambda conn: potm.pending_months(conn, MONTH))
+
+
+def test_admin_panel_logs_use_timestamp_index(client, statements):
+    start = len(statements)
+    assert client.get("/admin").status_code == 200
+    logs = [s for s in statements[start:] if re.search(r"\bFROM (admin_log|auth_log)\b", s)]
+    assert len(logs) == 2
+    with database.get_db() as conn:
+        for sql in logs:
+            details = [row["detail"] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+            assert not any(d.startswith("SCAN") and "INDEX" not in d for d in details), details
+            assert not any("TEMP B-TREE" in d for d in details), details
@@ -0,0 +1,37 @@
+"""
+Version stamps for cached data.
+
+Every key (GLOBAL, and one per player, see `player_key`) has a counter
+in the data_versions table. Writers bump it inside the same transaction as the
+change; caches remember the version they were built from and rebuild when
+it moves. Because the counter lives in the database, a write handled by
+one worker process is seen by every other worker on its next lookup.
+"""
+
+# Anything shown on the shared stats, leaderboard and history pages
+GLOBAL = "global"
+
+_BUMP = """
+INSERT INTO data_versions (key, version) VALUES (?, 1)
+ON CONFLICT(key) DO UPDATE SET version = version + 1
+"""
+
+
+def player_key(username: str) -> str:
+    return f"player:{username}"
+
+
+def bump(db, *keys):
+    """Advance the version of each key. The caller owns the transaction."""
+    db.executemany(_BUMP, [(key,) for key in keys])
+
+
+def bump_players(db, *usernames):
+    """Record a change to these players' data. Shared pages list every
+    player, so this advances the global version as well."""
+    bump(db, GLOBAL, *(player_key(u) for u in usernames))
+
+
+def current(db, key: str) -> int:
+    row = db.execute("SELECT version FROM data_versions WHERE key = ?", (key,)).fetchone()
+    return row["version"] if row else 0